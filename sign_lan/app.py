@@ -3,30 +3,23 @@ import sys
 from pathlib import Path
 import tkinter as tk
 from tkinter import messagebox
-from hand_detector import HandDetector
-from data_collector import DataCollector
-from model_trainer import ModelTrainer
-from predictor import SignPredictor
 from config import *
+from resources import ResourceManager, BackgroundWorker
 
 # Add project directory to Python path
 project_dir = Path(__file__).resolve().parent
 if str(project_dir) not in sys.path:
     sys.path.append(str(project_dir))
 
-def initialize_collector():
-    """Initialize HandDetector and DataCollector."""
-    detector = HandDetector(
-        static_mode=False,
-        max_hands=1,
-        detection_confidence=0.5,
-        tracking_confidence=0.5
-    )
-    collector = DataCollector(
-        hand_detector=detector,
-        num_samples=SAMPLES_PER_SIGN
-    )
-    return collector
+# Heavy modules (MediaPipe, TensorFlow) are imported only when an action needs them,
+# so the menu shows up immediately.
+
+def dataset_exists():
+    """True if collected data is available for training."""
+    if os.path.exists(FEATURES_PATH):
+        return True
+    from dataset_store import DatasetStore
+    return DatasetStore.exists(STORE_DIR)
 
 class SignLanguageTranslatorApp:
     def __init__(self, root):
@@ -34,6 +27,13 @@ class SignLanguageTranslatorApp:
         self.root.title("Sign Language Translator")
         self.root.geometry("400x300")
 
+        # Loaded models and detectors are kept between clicks. Loading and training
+        # run on a background worker so the window stays responsive; OpenCV windows
+        # must stay on this (main) thread
+        self.resources = ResourceManager()
+        self.worker = BackgroundWorker()
+        self.worker.attach(root)
+
         self.label = tk.Label(root, text="Bridgify : Sign Language Recognition System", font=("Helvetica", 16))
         self.label.pack(pady=20)
 
@@ -43,18 +43,64 @@ class SignLanguageTranslatorApp:
         self.train_model_button = tk.Button(root, text="Train Model", command=self.train_model)
         self.train_model_button.pack(pady=10)
 
+        self.update_model_button = tk.Button(root, text="Update Model With New Data", command=self.update_model)
+        self.update_model_button.pack(pady=10)
+
         self.run_prediction_button = tk.Button(root, text="Run Real-Time Prediction", command=self.run_prediction)
         self.run_prediction_button.pack(pady=10)
 
-        self.exit_button = tk.Button(root, text="Exit", command=root.quit)
+        self.exit_button = tk.Button(root, text="Exit", command=self.exit)
         self.exit_button.pack(pady=10)
 
+        self.action_buttons = [self.collect_data_button, self.train_model_button, self.update_model_button,
+                               self.run_prediction_button]
+
+    def _run_in_background(self, task, on_done=None):
+        """
+        Disable the action buttons while task runs on the worker and
+        on_done(result) runs on the Tk thread.
+        """
+        for button in self.action_buttons:
+            button.config(state=tk.DISABLED)
+
+        def finish(result):
+            try:
+                if on_done:
+                    on_done(result)
+            except Exception as e:
+                messagebox.showerror("Error", str(e))
+            finally:
+                self._enable_buttons()
+
+        def fail(error):
+            self._enable_buttons()
+            messagebox.showerror("Error", str(error))
+
+        self.worker.submit(task, finish, fail)
+
+    def _enable_buttons(self):
+        for button in self.action_buttons:
+            button.config(state=tk.NORMAL)
+
     def collect_data(self):
-        collector = initialize_collector()
+        if FRAME_BUS:
+            self._run_in_background(self._collect_on_frame_bus, lambda _: self._collection_done())
+            return
+        # The collector's OpenCV window runs on this thread once the detector is loaded
+        self._run_in_background(self.resources.get_collector, self._collect_all_signs)
+
+    def _collection_done(self):
+        messagebox.showinfo("Info", "All data collection completed and saved in the dataset folder!")
+
+    def _collect_all_signs(self, collector):
         print("\nStarting data collection...")
         print("Available signs:", list(SIGNS.values()))
 
-        for sign_name, class_id in SIGNS.items():
+        for class_id, sign_name in SIGNS.items():
+            if collector.is_complete(class_id):
+                print(f"\nSign '{sign_name}' already has {SAMPLES_PER_SIGN} samples, skipping")
+                continue
+            
             print(f"\nCollecting data for sign '{sign_name}'")
             print(f"Class ID: {class_id}")
             print("Press 'c' to start collecting samples.")
@@ -70,31 +116,68 @@ class SignLanguageTranslatorApp:
 
         # Save the collected data
         collector.save_data()
-        messagebox.showinfo("Info", "All data collection completed and saved in the dataset folder!")
-
-    def train_model(self):
-        features_path = os.path.join(DATASET_DIR, 'features.npy')
-        labels_path = os.path.join(DATASET_DIR, 'labels.npy')
-
-        if not os.path.exists(features_path) or not os.path.exists(labels_path):
+        self._collection_done()
+
+    def _collect_on_frame_bus(self):
+        """Collect every sign with the camera, detector and preview in their own processes."""
+        from frame_bus import FrameBusSession
+        with FrameBusSession(title='Data Collection') as session:
+            if not session.start():
+                raise RuntimeError("Could not open the camera.")
+            for class_id, sign_name in SIGNS.items():
+                if session.stopped:
+                    break
+                print(f"\nCollecting data for sign '{sign_name}' (press 'c' in the preview to start, 'q' to skip)")
+                session.record(class_id)
+
+    def train_model(self, incremental=False):
+        if not dataset_exists():
             messagebox.showwarning("Warning", "Dataset not found. Please collect data first.")
             return
 
-        trainer = ModelTrainer()
-        history = trainer.train()
+        def train():
+            from model_trainer import ModelTrainer
+            
+            trainer = ModelTrainer()
+            history = trainer.train_incremental() if incremental else trainer.train()
+            if history and EXPORT_AFTER_TRAINING:
+                from export import export_models
+                export_models(trainer.model)
+            return history
 
-        if history:
-            messagebox.showinfo("Info", "Training completed successfully! Model saved in models folder.")
+        def done(history):
+            if history:
+                messagebox.showinfo("Info", "Training completed successfully! Model saved in models folder.")
 
-    def run_prediction(self):
-        model_path = os.path.join(MODEL_DIR, 'sign_language_model.h5')
+        self._run_in_background(train, done)
+
+    def update_model(self):
+        """Fine-tune the saved model on data collected since it was trained."""
+        self.train_model(incremental=True)
 
-        if not os.path.exists(model_path):
+    def run_prediction(self):
+        if not os.path.exists(MODEL_PATH):
             messagebox.showwarning("Warning", "No trained model found. Please train the model first.")
             return
 
-        predictor = SignPredictor()
-        predictor.run_prediction()
+        if FRAME_BUS:
+            self._run_in_background(self._predict_on_frame_bus)
+            return
+        # The engine is reloaded here only if training replaced the model file; the
+        # prediction window then runs on this thread
+        self._run_in_background(self.resources.get_predictor, lambda predictor: predictor.run_prediction())
+
+    def _predict_on_frame_bus(self):
+        """Prediction with the camera, detector, classifier and preview in their own processes."""
+        from frame_bus import FrameBusSession
+        with FrameBusSession() as session:
+            if not session.start():
+                raise RuntimeError("Could not open the camera.")
+            session.predict()
+
+    def exit(self):
+        self.resources.release()
+        self.root.quit()
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,194 @@
+import argparse
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cv2
+import numpy as np
+from config import INFERENCE_BACKEND
+from hand_detector import HandDetector
+from predictor import SignPredictor
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp'}
+CSV_FIELDS = ['source', 'frame', 'prediction', 'confidence']
+
+
+def iter_frames(path):
+    """
+    Yields (frame_index, frame) from a video file or a directory of images.
+    Images are read in sorted filename order. Raises FileNotFoundError for a
+    missing input and ValueError for a video OpenCV cannot open.
+    """
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"No such file or directory: {path}")
+    if path.is_dir():
+        images = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for index, image_path in enumerate(images):
+            frame = cv2.imread(str(image_path))
+            if frame is not None:
+                yield index, frame
+        return
+
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        cap.release()
+        raise ValueError(f"Could not open video {path}")
+    index = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def source_fps(path, default=30.0):
+    """Frame rate of a video file, used to time-stamp frames for the decoder."""
+    if Path(path).is_dir():
+        return default
+    cap = cv2.VideoCapture(str(path))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps if fps and fps > 0 else default
+
+
+def process_source(path, backend=INFERENCE_BACKEND, batch_size=64, mirror=True):
+    """
+    Runs detection and classification over one video file or image folder.
+    Hand features are gathered into batches so the classifier runs once per batch.
+    Returns (per-frame records, decoded text).
+    """
+    # Images in a folder are unrelated, so MediaPipe should not track between them
+    detector = HandDetector(static_mode=Path(path).is_dir())
+    predictor = SignPredictor(backend=backend, hand_detector=detector, verbose=False)
+
+    records = []
+    batch = np.empty((batch_size, predictor.features.output_size), dtype=np.float32)
+    pending = []  # (record index, row in batch or None) for frames not yet decoded
+
+    def flush():
+        rows = sum(1 for _, row in pending if row is not None)
+        probabilities = predictor.engine.predict(batch[:rows]) if rows else None
+        # Frames are decoded in order, including the ones without a hand
+        for record_index, row in pending:
+            record = records[record_index]
+            frame_probabilities = probabilities[row] if row is not None else None
+            predictor.update_word(frame_probabilities, record['frame'] * frame_interval_ms)
+            if frame_probabilities is not None:
+                predicted_class = int(np.argmax(frame_probabilities))
+                record['prediction'] = predictor.class_names[predicted_class]
+                record['confidence'] = round(float(frame_probabilities[predicted_class]), 4)
+        pending.clear()
+
+    frame_interval_ms = 1000.0 / source_fps(path)
+    hands = 0
+    for frame_index, frame in iter_frames(path):
+        if mirror:
+            frame = cv2.flip(frame, 1)  # Match the mirrored webcam view used for training
+        detector.find_hands(frame, draw=False)
+        features = predictor.hand_features(frame)
+
+        records.append({'source': str(path), 'frame': frame_index, 'prediction': None, 'confidence': 0.0})
+        if features is None:
+            pending.append((len(records) - 1, None))
+            continue
+
+        batch[hands] = features[0]
+        pending.append((len(records) - 1, hands))
+        hands += 1
+        if hands == batch_size:
+            flush()
+            hands = 0
+    flush()
+
+    detector.release()
+    predictor.finish_word()
+    return records, predictor.text().rstrip()
+
+
+class PredictionWriter:
+    """Writes per-frame predictions as JSONL or CSV, chosen by the output file extension."""
+    def __init__(self, output_path):
+        self.output_path = Path(output_path)
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.output_path, 'w', newline='')
+        self.csv_writer = None
+        if self.output_path.suffix.lower() == '.csv':
+            self.csv_writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            self.csv_writer.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.csv_writer:
+                self.csv_writer.writerow(record)
+            else:
+                self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+def run_batch(inputs, output_path, workers=None, backend=INFERENCE_BACKEND, batch_size=64, mirror=True):
+    """
+    Scores every input across a process pool and writes the results.
+    Decoded text per source goes to a '.summary.json' file next to the output.
+    Returns the decoded texts.
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = PredictionWriter(output_path)
+    texts = {}
+
+    def collect(path, result):
+        """Write one input's results; a failing input is reported and skipped."""
+        try:
+            records, texts[str(path)] = result()
+        except Exception as e:
+            print(f"Error processing {path}: {str(e)}")
+            return
+        writer.write(records)
+        print(f"Processed {path}: {len(records)} frames")
+
+    try:
+        if workers == 1 or len(inputs) == 1:
+            for path in inputs:
+                collect(path, lambda: process_source(path, backend, batch_size, mirror))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(inputs))) as pool:
+                futures = {
+                    pool.submit(process_source, path, backend, batch_size, mirror): path
+                    for path in inputs
+                }
+                for future in as_completed(futures):
+                    collect(futures[future], future.result)
+    finally:
+        writer.close()
+
+    summary_path = Path(output_path).with_suffix('.summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump(texts, f, indent=2)
+    print(f"Predictions saved to {output_path}")
+    print(f"Decoded text saved to {summary_path}")
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless sign prediction over video files and image folders.")
+    parser.add_argument('inputs', nargs='+', help="Video files or directories of images")
+    parser.add_argument('-o', '--output', default='predictions.jsonl', help="Output .jsonl or .csv file")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('-b', '--batch-size', type=int, default=64, help="Landmark vectors per classifier call")
+    parser.add_argument('--backend', default=INFERENCE_BACKEND, help="Inference backend (numpy, keras, tflite)")
+    parser.add_argument('--no-mirror', action='store_true', help="Do not flip frames horizontally")
+    args = parser.parse_args()
+
+    run_batch(args.inputs, args.output, args.workers, args.backend, args.batch_size, not args.no_mirror)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+# Modules whose import cost is tracked by the startup benchmark
+STARTUP_MODULES = [
+    'config', 'main', 'app', 'hand_detector', 'predictor', 'data_collector',
+    'dataset_store', 'model_trainer', 'temporal_decoder', 'word_decoder', 'knn_index',
+]
+
+# Hot-path benchmark defaults
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+BATCH_SIZES = [1, 8, 32, 128]
+BACKENDS = ['numpy']
+FRAME_COUNT = 60  # distinct synthetic frames, cycled through during a run
+LEXICON_SIZE = 20000  # words in the synthetic word list for the word decoder
+KNN_INDEX_SIZE = 20000  # enrolled samples in the synthetic nearest-neighbour index
+SEED = 0
+REGRESSION_TOLERANCE = 0.2  # allowed slowdown of p50 latency before a benchmark counts as a regression
+
+# Landmark fixture: an open right hand as (x, y) offsets from the wrist, in units of the
+# wrist to middle-knuckle distance (y points down, as in image coordinates)
+HAND_POSE = np.array([
+    (0.0, 0.0),
+    (-0.35, -0.25), (-0.6, -0.45), (-0.8, -0.6), (-0.95, -0.75),   # thumb
+    (-0.3, -0.95), (-0.35, -1.4), (-0.38, -1.7), (-0.4, -1.95),    # index
+    (0.0, -1.0), (0.0, -1.5), (0.0, -1.82), (0.0, -2.08),          # middle
+    (0.28, -0.95), (0.32, -1.4), (0.35, -1.7), (0.37, -1.93),      # ring
+    (0.52, -0.82), (0.62, -1.15), (0.68, -1.37), (0.72, -1.57),    # little
+], dtype=np.float32)
+
+
+def measure_import(module, repeats=3):
+    """
+    Best wall-clock time in seconds to import a module in a fresh interpreter,
+    plus the top-level dependencies that dominate it (from python -X importtime).
+    Returns None for the time if the import fails.
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    best, breakdown, error = None, [], None
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                cwd=PROJECT_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed'
+            break
+        elapsed = float(result.stdout.strip().splitlines()[-1])
+        if best is None or elapsed < best:
+            best, breakdown = elapsed, _parse_importtime(result.stderr, module)
+    return {'module': module, 'seconds': best, 'top_imports': breakdown[:5], 'error': error}
+
+
+def _parse_importtime(stderr, module):
+    """Direct imports of module sorted by cumulative milliseconds."""
+    children, result = [], []
+    for line in stderr.splitlines():
+        parts = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(parts) != 3 or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = parts
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            children.append({'module': name.strip(), 'ms': int(cumulative_us) / 1000.0})
+        elif depth == 0:
+            if name.strip() == module:
+                result = children
+            children = []
+    result.sort(key=lambda item: item['ms'], reverse=True)
+    return result
+
+
+def bench_startup(modules=STARTUP_MODULES, repeats=3):
+    """Import cost of each module; main and app should stay light."""
+    results = [measure_import(module, repeats) for module in modules]
+    for result in results:
+        if result['error']:
+            print(f"{result['module']:<18} failed: {result['error']}")
+        else:
+            print(f"{result['module']:<18} {result['seconds'] * 1000:8.1f} ms")
+    return results
+
+
+def _hand_position(resolution, i, count):
+    """(x, y, radius) in pixels of the hand-sized blob in synthetic frame i."""
+    width, height = resolution
+    return int(width * (0.3 + 0.4 * i / max(count - 1, 1))), int(height * 0.5), max(height // 6, 8)
+
+
+def synthetic_frames(resolution, count=FRAME_COUNT, seed=SEED):
+    """
+    Deterministic BGR frames: a noisy background with a skin-coloured hand-sized
+    blob that moves across the image, so motion gating and tracking see change.
+    MediaPipe finds no hand in them; see synthetic_hand_results().
+    """
+    import cv2
+
+    width, height = resolution
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 90, size=(height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        cx, cy, radius = _hand_position(resolution, i, count)
+        cv2.ellipse(frame, (cx, cy), (radius, int(radius * 1.3)), 0, 0, 360, (120, 160, 210), -1)
+        for finger in range(5):
+            x = cx - radius + finger * radius // 2
+            cv2.line(frame, (x, cy - radius), (x, cy - 2 * radius), (120, 160, 210), max(radius // 5, 2))
+        frames.append(frame)
+    return frames
+
+
+def synthetic_hand_results(resolution, count=FRAME_COUNT):
+    """
+    MediaPipe Hands results with one right hand (HAND_POSE) per synthetic frame,
+    placed over its blob. Injected after detection on synthetic frames, so the
+    benchmarks time landmark extraction, classification and decoding on a hand
+    rather than only the no-hand path.
+    """
+    from mediapipe.framework.formats import classification_pb2, landmark_pb2
+
+    width, height = resolution
+    handedness = classification_pb2.ClassificationList(
+        classification=[classification_pb2.Classification(index=1, score=0.99, label='Right')])
+    results = []
+    for i in range(count):
+        cx, cy, radius = _hand_position(resolution, i, count)
+        points = HAND_POSE * radius + (cx, cy + radius)  # wrist at the bottom of the blob
+        hand = landmark_pb2.NormalizedLandmarkList(landmark=[
+            landmark_pb2.NormalizedLandmark(x=float(x) / width, y=float(y) / height, z=-0.02 * (j % 4))
+            for j, (x, y) in enumerate(points)])
+        results.append(SimpleNamespace(multi_hand_landmarks=[hand], multi_handedness=[handedness]))
+    return results
+
+
+def load_frames(path, resolution, count=FRAME_COUNT):
+    """Up to count frames of a recorded video, resized to resolution."""
+    import cv2
+
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA))
+    cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+    return frames
+
+
+def synthetic_landmarks(count, seed=SEED):
+    """(count, 63) float32 landmark vectors in pixel-like ranges, as HandDetector produces."""
+    from config import INPUT_SHAPE
+
+    rng = np.random.default_rng(seed)
+    landmarks = rng.normal(size=(count, INPUT_SHAPE // 3, 3)).astype(np.float32)
+    landmarks[:, :, 0] = 320 + 60 * landmarks[:, :, 0]
+    landmarks[:, :, 1] = 240 + 60 * landmarks[:, :, 1]
+    landmarks[:, :, 2] *= 0.05
+    return landmarks.reshape(count, INPUT_SHAPE)
+
+
+def synthetic_words(count, seed=SEED):
+    """{word: count} of random 2-10 letter words with Zipf-distributed counts, standing in for a word list."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    return {''.join(rng.choice(letters, rng.integers(2, 11))): 1_000_000 // rank for rank in range(1, count + 1)}
+
+
+def time_calls(name, fn, iterations, warmup=10, items_per_call=1, **params):
+    """
+    Call fn(i) warmup + iterations times and summarise the latency of the timed calls.
+    Throughput counts items_per_call items (frames or vectors) per call.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies = np.empty(iterations)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        latencies[i] = time.perf_counter() - start
+    latencies_ms = latencies * 1000.0
+    result = {
+        'name': name,
+        'params': params,
+        'iterations': iterations,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p90_ms': float(np.percentile(latencies_ms, 90)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'throughput_per_s': float(items_per_call * iterations / latencies.sum()),
+    }
+    print(f"{benchmark_key(result):<48} p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms"
+          f"  {result['throughput_per_s']:10.1f}/s")
+    return result
+
+
+def benchmark_key(result):
+    """Stable identifier used to match results against a baseline."""
+    params = ','.join(f"{key}={value}" for key, value in sorted(result['params'].items()))
+    return f"{result['name']}[{params}]" if params else result['name']
+
+
+def bench_classifier(backends=BACKENDS, batch_sizes=BATCH_SIZES, iterations=500):
+    """
+    Engine.predict across batch sizes, SignPredictor.predict_sign on single vectors,
+    the current feature pipeline, the temporal and word decoders, and nearest-neighbour
+    search with each index method.
+    """
+    from config import SIGNS
+    from features import FeaturePipeline, load_feature_pipeline
+    from predictor import SignPredictor, create_engine
+    from temporal_decoder import create_decoder
+    from word_decoder import Lexicon, WordDecoder
+    from knn_index import KNNIndex, KNN_METHODS
+
+    results = []
+    landmarks = synthetic_landmarks(max(batch_sizes) * 4)
+    for backend in backends:
+        try:
+            engine = create_engine(backend)
+        except Exception as e:
+            print(f"Skipping backend {backend}: {e}")
+            continue
+        pipeline = load_feature_pipeline(engine.model_path)
+        features = pipeline.transform(landmarks)
+        for batch_size in batch_sizes:
+            batches = [features[i:i + batch_size] for i in range(0, len(features) - batch_size + 1, batch_size)]
+            results.append(time_calls('engine.predict', lambda i: engine.predict(batches[i % len(batches)]),
+                                      iterations, items_per_call=batch_size,
+                                      backend=backend, batch_size=batch_size))
+
+        predictor = SignPredictor(backend=backend, hand_detector=object(), verbose=False, engine=engine)
+        results.append(time_calls('predictor.predict_sign',
+                                  lambda i: predictor.predict_sign(landmarks[i % len(landmarks)]),
+                                  iterations, backend=backend))
+
+    pipeline = FeaturePipeline()
+    results.append(time_calls('features.transform', lambda i: pipeline.transform(landmarks[:1]), iterations,
+                              version=pipeline.version))
+    batch = landmarks[:max(batch_sizes)]
+    results.append(time_calls('features.transform', lambda i: pipeline.transform(batch), iterations,
+                              items_per_call=len(batch), version=pipeline.version, batch_size=len(batch)))
+
+    decoder = create_decoder()
+    probabilities = np.random.default_rng(SEED).dirichlet(np.ones(8), size=256).astype(np.float32)
+    results.append(time_calls('decoder.update',
+                              lambda i: decoder.update(probabilities[i % len(probabilities)], i * 33.0),
+                              iterations, decoder=type(decoder).__name__))
+
+    # One committed letter per call, ending the word after every eighth
+    words = WordDecoder(Lexicon(synthetic_words(LEXICON_SIZE)))
+    letter_ids = [class_id for class_id, name in SIGNS.items() if len(name) == 1]
+    letter_probabilities = np.zeros((256, len(SIGNS)), dtype=np.float32)
+    letter_probabilities[:, letter_ids] = np.random.default_rng(SEED).dirichlet(np.full(len(letter_ids), 0.1), 256)
+    def commit(i):
+        if i % 8 == 7:
+            return words.finish()
+        row = letter_probabilities[i % len(letter_probabilities)]
+        return words.add(int(np.argmax(row)), row)
+    results.append(time_calls('word_decoder.commit', commit, iterations, lexicon_size=LEXICON_SIZE))
+
+    enrolled = pipeline.transform(synthetic_landmarks(KNN_INDEX_SIZE, seed=SEED + 1))
+    enrolled_labels = np.random.default_rng(SEED).integers(0, len(SIGNS), KNN_INDEX_SIZE)
+    queries = pipeline.transform(landmarks)
+    for method in KNN_METHODS:
+        index = KNNIndex(pipeline.output_size, pipeline.spec(), method=method)
+        index.add(enrolled, enrolled_labels)
+        index.build()
+        results.append(time_calls('knn.predict_proba', lambda i: index.predict_proba(queries[i % len(queries)]),
+                                  iterations, method=method, index_size=KNN_INDEX_SIZE))
+    return results
+
+
+def record_hand_rate(result, counts, frames_path, required=True):
+    """
+    Store the fraction of calls that saw a hand. A required benchmark that never
+    saw one timed only the no-hand path, so the run fails instead.
+    """
+    result['hand_rate'] = counts['hands_found'] / max(counts['calls'], 1)
+    if required and not counts['hands_found']:
+        source = frames_path or 'the synthetic frames'
+        raise RuntimeError(f"{benchmark_key(result)}: no hand was found in any frame of {source}")
+    return result
+
+
+def bench_detector(resolutions=RESOLUTIONS, iterations=100, frames_path=None):
+    """
+    HandDetector.find_hands and get_landmark_array at each resolution. With a
+    recording, find_hands must detect a hand in some of its frames; synthetic
+    frames time detection without a hand and extraction on the landmark fixture.
+    """
+    from hand_detector import HandDetector
+
+    results = []
+    for resolution in resolutions:
+        frames = load_frames(frames_path, resolution) if frames_path else synthetic_frames(resolution)
+        hands = None if frames_path else synthetic_hand_results(resolution)
+        detector = HandDetector(max_hands=1)
+        size = f"{resolution[0]}x{resolution[1]}"
+        counts = {'calls': 0, 'hands_found': 0}
+        detected = []  # results with a hand, for timing extraction on a recording
+
+        def detect(i):
+            detector.find_hands(frames[i % len(frames)], draw=False)
+            counts['calls'] += 1
+            if detector.results.multi_hand_landmarks:
+                counts['hands_found'] += 1
+                if len(detected) < len(frames):
+                    detected.append(detector.results)
+
+        # MediaPipe finds no hand in synthetic frames, so only a recording must contain one
+        results.append(record_hand_rate(time_calls('detector.find_hands', detect, iterations, resolution=size),
+                                        counts, frames_path, required=bool(frames_path)))
+
+        hand_results = hands or detected
+
+        def extract(i):
+            if hand_results:
+                detector.results = hand_results[i % len(hand_results)]
+            landmarks = detector.get_landmark_array(frames[i % len(frames)], copy=False)
+            counts['calls'] += 1
+            counts['hands_found'] += landmarks is not None
+
+        counts.update(calls=0, hands_found=0)
+        results.append(record_hand_rate(time_calls('detector.get_landmark_array', extract, iterations * 10,
+                                                   resolution=size), counts, frames_path))
+        detector.release()
+    return results
+
+
+def bench_loop(resolutions=RESOLUTIONS, backend=BACKENDS[0], iterations=100, frames_path=None):
+    """
+    The full per-frame loop of run_prediction without the window: flip, detect,
+    classify, decode, draw. On synthetic frames the landmark fixture stands in
+    for MediaPipe's empty result, so classification and decoding are timed too.
+    """
+    import cv2
+    from hand_detector import HandDetector
+    from predictor import SignPredictor
+
+    results = []
+    for resolution in resolutions:
+        frames = load_frames(frames_path, resolution) if frames_path else synthetic_frames(resolution)
+        hands = None if frames_path else synthetic_hand_results(resolution)
+        detector = HandDetector(max_hands=1)
+        predictor = SignPredictor(backend=backend, hand_detector=detector, verbose=False)
+        counts = {'calls': 0, 'hands_found': 0}
+
+        def step(i):
+            frame = cv2.flip(frames[i % len(frames)], 1)
+            detector.find_hands(frame, draw=False)
+            if hands and not detector.results.multi_hand_landmarks:
+                detector.results = hands[i % len(hands)]
+            for hand_landmarks in detector.results.multi_hand_landmarks or []:  # as find_hands(draw=True)
+                detector.mp_draw.draw_landmarks(frame, hand_landmarks, detector.mp_hands.HAND_CONNECTIONS)
+            features = predictor.hand_features(frame)
+            probabilities = predictor.engine.predict(features)[0] if features is not None else None
+            current_prediction, confidence = predictor.update_word(probabilities, i * 33.0)
+            predictor.draw_prediction(frame, current_prediction, confidence)
+            predictor.draw_word(frame)
+            counts['calls'] += 1
+            counts['hands_found'] += features is not None
+
+        results.append(record_hand_rate(time_calls('loop.frame', step, iterations, backend=backend,
+                                                   resolution=f"{resolution[0]}x{resolution[1]}"),
+                                        counts, frames_path))
+        detector.release()
+    return results
+
+
+def environment_info():
+    """Library versions recorded with every run, to explain differences between runs."""
+    from importlib import metadata
+
+    info = {'python': platform.python_version(), 'platform': platform.platform(), 'numpy': np.__version__}
+    for package in ('opencv-python', 'opencv-python-headless', 'mediapipe', 'tensorflow', 'tensorflow-cpu'):
+        try:
+            info[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            pass  # read from package metadata so TensorFlow is not imported just for its version
+    return info
+
+
+def bench_hotpath(resolutions=RESOLUTIONS, batch_sizes=BATCH_SIZES, backends=BACKENDS, iterations=100,
+                  frames_path=None):
+    """
+    Run every hot-path benchmark. Detector and loop benchmarks need MediaPipe
+    and are skipped (with a message) when it is not installed.
+    """
+    results = bench_classifier(backends, batch_sizes, iterations * 5)
+    try:
+        results += bench_detector(resolutions, iterations, frames_path)
+        results += bench_loop(resolutions, backends[0], iterations, frames_path)
+    except ImportError as e:
+        print(f"Skipping detector and loop benchmarks: {e}")
+    return {'environment': environment_info(), 'timestamp': time.time(), 'results': results}
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """
+    Benchmarks whose p50 latency grew by more than tolerance (a fraction) against
+    the baseline. Benchmarks missing from either run are ignored.
+    """
+    previous = {benchmark_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        key = benchmark_key(result)
+        if key not in previous:
+            continue
+        ratio = result['p50_ms'] / previous[key]['p50_ms'] if previous[key]['p50_ms'] else 1.0
+        status = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        print(f"{key:<48} {previous[key]['p50_ms']:8.3f} -> {result['p50_ms']:8.3f} ms ({ratio:5.2f}x) {status}")
+        if status != 'ok':
+            regressions.append({'benchmark': key, 'baseline_p50_ms': previous[key]['p50_ms'],
+                                'p50_ms': result['p50_ms'], 'ratio': ratio})
+    return regressions
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def parse_resolution(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def save_results(results, output_path):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the sign language project.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    startup_parser = subparsers.add_parser('startup', help="Import time of each module")
+    startup_parser.add_argument('modules', nargs='*', default=STARTUP_MODULES)
+    startup_parser.add_argument('--repeats', type=int, default=3)
+    startup_parser.add_argument('-o', '--output', help="Save results as JSON")
+
+    hotpath_parser = subparsers.add_parser('hotpath', help="Detection, classification and full-loop latency")
+    hotpath_parser.add_argument('--resolutions', nargs='+', type=parse_resolution, default=RESOLUTIONS,
+                                help="Frame sizes such as 640x480")
+    hotpath_parser.add_argument('--batch-sizes', nargs='+', type=int, default=BATCH_SIZES)
+    hotpath_parser.add_argument('--backends', nargs='+', default=BACKENDS)
+    hotpath_parser.add_argument('--iterations', type=int, default=100)
+    hotpath_parser.add_argument('--frames', help="Recorded video to use instead of synthetic frames")
+    hotpath_parser.add_argument('-o', '--output', help="Save results as JSON")
+    hotpath_parser.add_argument('--baseline', help="Results JSON to compare against")
+    hotpath_parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two saved hotpath results")
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+
+    args = parser.parse_args()
+    if args.command == 'startup':
+        results = bench_startup(args.modules, args.repeats)
+        if args.output:
+            save_results(results, args.output)
+        return
+
+    if args.command == 'hotpath':
+        results = bench_hotpath(args.resolutions, args.batch_sizes, args.backends, args.iterations, args.frames)
+        if args.output:
+            save_results(results, args.output)
+        if not args.baseline:
+            return
+        baseline = load_results(args.baseline)
+    else:
+        results, baseline = load_results(args.results), load_results(args.baseline)
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import threading
+
+import cv2
+import numpy as np
+from config import CAMERA_SOURCE, CAMERA_WIDTH, CAMERA_HEIGHT, CAMERA_FPS, CAMERA_FOURCC, THREADED_CAPTURE
+
+
+def parse_source(source):
+    """A camera index for digit strings, otherwise the path of a video file."""
+    if isinstance(source, int):
+        return source
+    return int(source) if str(source).isdigit() else str(source)
+
+
+class Camera:
+    """
+    Frame source shared by data collection and prediction.
+
+    Requests the resolution, frame rate and FOURCC explicitly. For a live camera
+    a background thread grabs frames into three preallocated buffers (one being
+    written, the latest, and the one the caller holds), so read() always returns
+    the newest frame and the driver queue never builds up latency. Video files
+    are read in order on the calling thread so every frame is seen.
+
+    read() returns a buffer that stays valid until the next read(); flip() and
+    HandDetector's colour conversion write into preallocated buffers as well,
+    so the hot loop does not allocate per frame.
+    """
+    def __init__(self, source=CAMERA_SOURCE, width=CAMERA_WIDTH, height=CAMERA_HEIGHT, fps=CAMERA_FPS,
+                 fourcc=CAMERA_FOURCC, threaded=THREADED_CAPTURE):
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str)
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            if fourcc:
+                self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # not every backend honours this
+
+        self.threaded = threaded and not self.is_file
+        self.buffers = []
+        self.flip_buffer = None
+        self.condition = threading.Condition()
+        self.latest = -1    # buffer index of the newest frame
+        self.reading = -1   # buffer index handed out by the last read()
+        self.sequence = 0   # frames grabbed so far
+        self.last_read = 0  # sequence number of the frame last returned
+        self.grabbed = 0
+        self.delivered = 0
+        self.stopped = False
+        self.thread = None
+
+        if self.cap.isOpened():
+            ret, frame = self.cap.read()
+            if ret:
+                # The first frame tells the real size; the driver may not honour the request
+                self.buffers = [frame] + [np.empty_like(frame) for _ in range(2 if self.threaded else 0)]
+                self.flip_buffer = np.empty_like(frame)
+                self.latest, self.sequence, self.grabbed = 0, 1, 1
+            else:
+                self.cap.release()
+        if self.threaded and self.buffers:
+            self.thread = threading.Thread(target=self._grab, name='camera-grabber', daemon=True)
+            self.thread.start()
+
+    def is_opened(self):
+        return bool(self.buffers) and self.cap.isOpened()
+
+    @property
+    def resolution(self):
+        """Actual (width, height) of the delivered frames."""
+        if not self.buffers:
+            return None
+        height, width = self.buffers[0].shape[:2]
+        return width, height
+
+    def _grab(self):
+        while not self.stopped:
+            with self.condition:
+                slot = next(i for i in range(3) if i != self.latest and i != self.reading)
+            ret, frame = self.cap.read(self.buffers[slot])
+            if not ret:
+                break
+            with self.condition:
+                self.buffers[slot] = frame  # same array unless the driver changed the frame size
+                self.latest = slot
+                self.sequence += 1
+                self.grabbed += 1
+                self.condition.notify()
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def read(self, timeout=1.0):
+        """
+        Returns (ret, frame) like cv2.VideoCapture.read. The frame is a reused
+        buffer, valid until the next call; copy it to keep it longer.
+        """
+        if not self.buffers:
+            return False, None
+        if not self.threaded:
+            if self.sequence > self.last_read:  # the frame read while opening
+                self.last_read = self.sequence
+                self.delivered += 1
+                return True, self.buffers[0]
+            ret, frame = self.cap.read(self.buffers[0])
+            if not ret:
+                return False, None
+            self.buffers[0] = frame
+            self.sequence += 1
+            self.grabbed += 1
+            self.last_read = self.sequence
+            self.delivered += 1
+            return True, frame
+
+        with self.condition:
+            # Wait for a frame newer than the last one returned
+            if self.sequence == self.last_read and not self.stopped:
+                self.condition.wait_for(lambda: self.sequence > self.last_read or self.stopped, timeout)
+            if self.sequence == self.last_read:
+                return False, None
+            self.reading = self.latest
+            self.last_read = self.sequence
+            self.delivered += 1
+            return True, self.buffers[self.reading]
+
+    def flip(self, frame):
+        """Mirror frame horizontally into the preallocated flip buffer."""
+        if self.flip_buffer is None or self.flip_buffer.shape != frame.shape:
+            self.flip_buffer = np.empty_like(frame)
+        return cv2.flip(frame, 1, dst=self.flip_buffer)
+
+    def stats(self):
+        """Frames grabbed from the source and delivered by read(); the rest were superseded."""
+        return {'grabbed': self.grabbed, 'delivered': self.delivered, 'dropped': self.grabbed - self.delivered}
+
+    def release(self):
+        self.stopped = True
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
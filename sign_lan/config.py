@@ -1,25 +1,64 @@
+import json
 import os
 
-# Base directory: Change to match your system
-BASE_DIR = os.path.abspath("D:/Nicolas/sign_lan")  # Ensures an absolute path
+# Any setting below can be overridden without editing this file, either by a
+# JSON file of {"SETTING_NAME": value} (SIGN_LAN_CONFIG, default: sign_lan.json
+# next to this file) or by SIGN_LAN_<SETTING_NAME> environment variables.
+# Nothing here touches the filesystem beyond reading that file, so importing
+# config is cheap; directories are created by ensure_directories() when needed.
+CONFIG_FILE = os.environ.get('SIGN_LAN_CONFIG',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sign_lan.json'))
 
-# Dataset and model directories
-DATASET_DIR = os.path.join(BASE_DIR, 'dataset')
+def _load_config_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+_file_settings = _load_config_file(CONFIG_FILE)
+
+def _setting(name, default):
+    """Value of a setting from the environment, then the config file, then the default."""
+    value = os.environ.get(f'SIGN_LAN_{name}')
+    if value is None:
+        value = _file_settings.get(name, default)
+    elif isinstance(default, bool):
+        value = value.lower() in ('1', 'true', 'yes', 'on')
+    elif isinstance(default, (int, float)):
+        value = type(default)(value)
+    elif isinstance(default, dict):
+        value = json.loads(value)
+    if isinstance(default, dict) and value is not default:
+        value = {int(key): item for key, item in value.items()}  # JSON keys are strings
+    return value
+
+# Base directory: defaults to the folder this file is in
+BASE_DIR = os.path.abspath(_setting('BASE_DIR', os.path.dirname(os.path.abspath(__file__))))
+
+# Dataset and model directories, resolved before the paths inside them are derived
+DATASET_DIR = os.path.abspath(_setting('DATASET_DIR', os.path.join(BASE_DIR, 'dataset')))
 FEATURES_PATH = os.path.join(DATASET_DIR, 'features.npy')
 LABELS_PATH = os.path.join(DATASET_DIR, 'labels.npy')
 SIGNS_DIR = os.path.join(DATASET_DIR, 'signs')
+STORE_DIR = os.path.join(DATASET_DIR, 'store')  # Append-only sharded dataset written during collection
+LEXICON_PATH = os.path.join(DATASET_DIR, 'lexicon.txt')  # Word list for word decoding: 'WORD [count]' per line
 
-MODEL_DIR = os.path.join(BASE_DIR, 'models')
+MODEL_DIR = os.path.abspath(_setting('MODEL_DIR', os.path.join(BASE_DIR, 'models')))
 MODEL_PATH = os.path.join(MODEL_DIR, 'sign_language_model.h5')
+CHECKPOINT_DIR = os.path.join(MODEL_DIR, 'checkpoints')  # Training state for resuming interrupted runs
+TFLITE_MODEL_PATH = os.path.join(MODEL_DIR, 'sign_language_model.tflite')
+ONNX_MODEL_PATH = os.path.join(MODEL_DIR, 'sign_language_model.onnx')
+KNN_INDEX_PATH = os.path.join(MODEL_DIR, 'sign_index')  # Nearest-neighbour index directory (knn_index.py)
 
-# Ensure required directories exist
-directories = [DATASET_DIR, SIGNS_DIR, MODEL_DIR]
-for directory in directories:
-    try:
-        os.makedirs(directory, exist_ok=True)  # Create if not exists
-    except OSError as e:
-        print(f"Error creating directory {directory}: {e}")
-        raise
+def ensure_directories(*directories):
+    """Create the given directories (default: dataset and model directories) if missing."""
+    for directory in directories or (DATASET_DIR, MODEL_DIR):
+        try:
+            os.makedirs(directory, exist_ok=True)  # Create if not exists
+        except OSError as e:
+            print(f"Error creating directory {directory}: {e}")
+            raise
 
 # Sign language alphabet mapping
 SIGNS = {
@@ -33,11 +72,110 @@ SIGNS = {
 # Model parameters
 INPUT_SHAPE = 63  # 21 landmarks × 3 coordinates
 BATCH_SIZE = 32   # Number of samples per gradient update
-EPOCHS = 50       # Number of training iterations
+EPOCHS = 50       # Maximum number of training iterations
+EARLY_STOPPING_PATIENCE = 8  # Epochs without validation improvement before stopping
+REDUCE_LR_PATIENCE = 4       # Epochs without improvement before halving the learning rate
+INTRA_OP_THREADS = 0    # Threads used inside one TensorFlow op (0 = let TensorFlow decide)
+INTER_OP_THREADS = 0    # Ops TensorFlow may run concurrently (0 = let TensorFlow decide)
+MIXED_PRECISION = False  # Train with bfloat16 compute on CPUs that support it
 VALIDATION_SPLIT = 0.2  # Fraction of data for validation
+READ_CHUNK_SIZE = 1024  # Samples read from disk at a time by the training pipeline
+SHUFFLE_BUFFER = 10000  # Samples held in the training shuffle buffer
+AUGMENT_TRAINING = True  # Randomly scale, shift and jitter landmarks during training
+VALIDATION_CACHE = ''   # File to cache the validation split in ('' keeps it in memory)
+INCREMENTAL_EPOCHS = 10  # Maximum epochs when fine-tuning the saved model on newly added data
+INCREMENTAL_LEARNING_RATE = 0.0003  # Lower than a fresh model's so fine-tuning only adjusts learned weights
+REPLAY_RATIO = 1.0       # Previously seen samples mixed in per new sample while fine-tuning
+
+# Feature pipeline (features.py); the options used are saved with each trained model
+MIRROR_LEFT_HANDS = True     # Mirror left hands so both hands share one canonical pose
+PAIRWISE_FEATURES = True     # Add the distance between every pair of landmarks
+JOINT_ANGLE_FEATURES = True  # Add the bend angle of every finger joint
 
 # Data collection parameters
 SAMPLES_PER_SIGN = 100  # Number of samples to collect per sign
+STORE_SHARD_SIZE = 4096  # Samples per memory-mapped dataset shard
+COLLECT_INTERVAL_MS = 100  # Keep at most one sample per this many milliseconds
+COLLECT_MIN_DELTA = 0.05   # Skip samples whose pose moved less than this (mean landmark distance, in hand sizes)
+
+# Hands tracked per camera during prediction (data collection always uses one)
+MAX_HANDS = 1
+
+# Skip MediaPipe on still frames and track the hand ROI during prediction (saves CPU on idle kiosks)
+ADAPTIVE_DETECTION = False
 
 # Confidence threshold for predictions
 CONFIDENCE_THRESHOLD = 0.7  # Minimum confidence to accept a prediction
+
+# Camera capture (capture.py)
+CAMERA_SOURCE = '0'      # Camera index, or the path of a video file to play instead
+CAMERA_WIDTH = 640
+CAMERA_HEIGHT = 480
+CAMERA_FPS = 30
+CAMERA_FOURCC = 'MJPG'   # Compressed USB transfer allows higher resolutions at full frame rate ('' keeps the driver default)
+THREADED_CAPTURE = True  # Grab camera frames on a background thread and keep only the latest
+
+# Real-time prediction pipeline
+PIPELINED_PREDICTION = False  # Run capture/detect/classify/display as separate stages
+PIPELINE_QUEUE_SIZE = 2       # Frames buffered between stages (older frames are dropped)
+FRAME_BUS = False             # Run the app's prediction and collection as separate processes sharing frames (frame_bus.py)
+FRAME_BUS_SLOTS = 8           # Records kept in each shared-memory ring of the frame bus
+
+# Inference backend used by SignPredictor: 'numpy' (no TensorFlow needed), 'keras', 'tflite', 'onnx',
+# 'auto' for the fastest artifact that passed the export accuracy gate (export.py),
+# or 'knn' for nearest-neighbour search over enrolled samples (knn_index.py)
+INFERENCE_BACKEND = 'numpy'
+
+# Nearest-neighbour classifier (knn_index.py)
+KNN_METHOD = 'ivf'          # 'exact', 'ivf' (search the closest clusters) or 'pq' (product-quantized codes)
+KNN_EMBEDDING = 'features'  # Index feature vectors, or 'model' for the trained network's last hidden layer
+KNN_NEIGHBOURS = 5          # Samples voting on each prediction
+KNN_LISTS = 0               # IVF clusters (0 = square root of the sample count)
+KNN_PROBES = 4              # IVF clusters searched per query
+KNN_PQ_SUBSPACES = 16       # PQ codes per vector (one byte each)
+
+# Export of quantized models after training (export.py)
+EXPORT_AFTER_TRAINING = True
+EXPORT_QUANTIZATION = 'int8'        # TFLite quantization: 'int8', 'dynamic' (weights only) or 'none'
+EXPORT_CALIBRATION_SAMPLES = 500    # Training samples used to calibrate int8 activation ranges
+EXPORT_MAX_ACCURACY_DROP = 0.01     # Reject exports losing more validation accuracy than this
+
+# Temporal decoding of per-frame predictions into letters: 'ema' or 'ctc'
+DECODER = 'ema'
+EMA_ALPHA = 0.3          # Weight of the newest frame in the moving average
+RELEASE_THRESHOLD = 0.5  # A committed sign must drop below this before it can commit again
+COMMIT_HOLD_MS = 300     # How long a sign must stay above CONFIDENCE_THRESHOLD to be committed
+REPEAT_HOLD_MS = 0       # Commit a held sign again after this long (0 disables repeats)
+BLANK_MS = 200           # Gaps without a hand (or a confident sign) shorter than this do not end a held sign
+CTC_BEAM_WIDTH = 8       # Beams kept by the CTC decoder
+CTC_WINDOW_MS = 1000     # Longest a CTC letter may stay undecided before it is committed
+
+# Word decoding of committed letters against LEXICON_PATH (word_decoder.py)
+WORD_DECODING = True     # Correct letters with the lexicon; without a word list letters are shown as signed
+WORD_BEAM_WIDTH = 8      # Spelling hypotheses kept per word
+WORD_TOP_K = 3           # Most likely letters considered for every committed letter
+LM_WEIGHT = 0.5          # Weight of the lexicon and character model against the classifier
+OOV_PENALTY = 6.0        # Log-probability cost of spelling a word that is not in the lexicon
+NUM_SUGGESTIONS = 3      # Word completions offered while signing (TAB accepts the first)
+
+# Micro-batching inference server (inference_server.py)
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_MAX_BATCH = 64     # Landmark vectors classified per engine call
+SERVER_MAX_WAIT_MS = 5    # Longest a request waits for the batch to fill
+
+# Per-stage latency instrumentation (instrumentation.py)
+INSTRUMENTATION = False    # Time each stage of the prediction and collection loops
+SHOW_OVERLAY = True        # Draw FPS and per-stage milliseconds on the frame when instrumented
+METRICS_PATH = ''          # Periodically write metrics here (.json, or .prom for Prometheus text)
+METRICS_INTERVAL_S = 10    # Seconds between metrics snapshots
+METRICS_PORT = 0           # Serve /metrics on this local port (0 disables)
+PROFILE_EVERY_N_FRAMES = 0  # cProfile one frame out of every N (0 disables)
+PROFILE_PATH = os.path.join(BASE_DIR, 'frame_profile.pstats')
+
+def _apply_overrides(settings):
+    for name, default in list(settings.items()):
+        if name.isupper() and name not in ('BASE_DIR', 'DATASET_DIR', 'MODEL_DIR', 'CONFIG_FILE'):
+            settings[name] = _setting(name, default)
+
+_apply_overrides(globals())
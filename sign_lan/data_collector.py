@@ -1,127 +1,154 @@
 # data_collector.py
+import time
+
 import cv2
 import numpy as np
-from pathlib import Path
-import os
+from config import STORE_DIR, COLLECT_INTERVAL_MS, COLLECT_MIN_DELTA
+from capture import Camera
+from dataset_store import DatasetStore, BackgroundWriter
+from features import normalize_landmarks
+from instrumentation import Instrumentation
 
 class DataCollector:
-    def __init__(self, hand_detector, num_samples=100):
+    def __init__(self, hand_detector, num_samples=100, store=None, instrumentation=None,
+                 min_interval_ms=COLLECT_INTERVAL_MS, min_delta=COLLECT_MIN_DELTA):
         """
         Initialize the data collector with a hand detector instance
         and the number of samples to collect per sign.
+        Samples are appended to a DatasetStore as they are collected; an existing
+        store is resumed, so signs that already have enough samples can be skipped.
+        To avoid filling a sign with near-identical consecutive frames, at most one
+        sample is kept per min_interval_ms, and only if the hand pose moved by at
+        least min_delta (mean landmark distance, in hand sizes) since the last one.
         """
         self.hand_detector = hand_detector
         self.num_samples = num_samples
-        self.dataset = []
-        self.labels = []
-        self.sign_data = {}  # Dictionary to store data for each sign
+        self.store = store if store is not None else DatasetStore(STORE_DIR)
+        self.instrumentation = instrumentation or Instrumentation()
+        self.min_interval_ms = min_interval_ms
+        self.min_delta = min_delta
+        
+    def is_complete(self, class_id):
+        """
+        True if the store already holds num_samples samples for this class.
+        """
+        return self.store.count(class_id) >= self.num_samples
         
     def collect_data(self, sign_name, class_id):
         """
         Collect data for a specific sign.
+        Samples are written by a background thread and progress is shown on
+        the frame, so the capture loop keeps a steady frame rate.
         """
-        cap = cv2.VideoCapture(0)
-        collected_samples = 0
+        camera = Camera()
+        writer = BackgroundWriter(self.store)
+        progress = {'collected': self.store.count(class_id), 'too_similar': 0}
         collecting = False
-        current_sign_data = []  # Store data for current sign
+        last_time, last_pose = None, None
+        timer = self.instrumentation
+        self.hand_detector.instrumentation = timer
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        try:
+            while progress['collected'] < self.num_samples:
+                with timer.stage('capture'):
+                    ret, frame = camera.read()
+                if not ret:
+                    break
+                    
+                # Flip frame for selfie view
+                with timer.stage('flip'):
+                    frame = camera.flip(frame)
                 
-            # Flip frame for selfie view
-            frame = cv2.flip(frame, 1)
-            
-            # Find hands and draw landmarks
-            frame = self.hand_detector.find_hands(frame)
-            
-            # Display instructions and status
-            self._display_info(frame, sign_name, class_id, collected_samples)
-            
-            if collecting:
-                # Get landmarks as flat array
-                landmarks = self.hand_detector.get_landmark_array(frame)
+                # Find hands and draw landmarks
+                frame = self.hand_detector.find_hands(frame)
                 
-                if landmarks is not None:
-                    current_sign_data.append(landmarks)
-                    self.dataset.append(landmarks)
-                    self.labels.append(class_id)
-                    collected_samples += 1
-                    print(f"Collected sample {collected_samples}/{self.num_samples} for sign {sign_name}")
+                if collecting:
+                    with timer.stage('landmarks'):
+                        sample, pose = self._sample(frame)
                     
-                    if collected_samples >= self.num_samples:
-                        # Store data for this sign
-                        self.sign_data[sign_name] = {
-                            'features': np.array(current_sign_data),
-                            'label': class_id
-                        }
-                        break
-            
-            # Handle key presses
-            key = cv2.waitKey(1)
-            if key == ord('q'):
-                break
-            elif key == ord('c'):
-                collecting = True
+                    if sample is not None:
+                        now = time.monotonic() * 1000.0
+                        if last_time is not None and now - last_time < self.min_interval_ms:
+                            pass  # rate limit
+                        elif last_pose is not None and np.linalg.norm(pose - last_pose, axis=-1).mean() < self.min_delta:
+                            progress['too_similar'] += 1
+                        else:
+                            with timer.stage('store'):
+                                writer.put(sample, class_id)
+                            progress['collected'] += 1
+                            last_time, last_pose = now, pose
                 
-            cv2.imshow('Data Collection', frame)
-        
-        cap.release()
-        cv2.destroyAllWindows()
+                # Display instructions and progress
+                with timer.stage('putText'):
+                    self._display_info(frame, sign_name, class_id, progress, collecting)
+                
+                # Handle key presses
+                with timer.stage('imshow'):
+                    key = cv2.waitKey(1)
+                    timer.draw_overlay(frame)
+                    cv2.imshow('Data Collection', frame)
+                timer.frame_done()
+                if key == ord('q'):
+                    break
+                elif key == ord('c'):
+                    collecting = True
+        finally:
+            writer.close()
+            camera.release()
+            cv2.destroyAllWindows()
+            timer.close()
+        print(f"Collected {progress['collected']}/{self.num_samples} samples for sign {sign_name} "
+              f"(skipped {progress['too_similar']} near-duplicates)")
     
-    def _display_info(self, frame, sign_name, class_id, collected_samples):
+    def _sample(self, frame):
         """
-        Display information on the frame.
+        (sample in the store's format, normalized pose) for the first hand,
+        or (None, None) when no hand was found.
         """
+        landmarks = self.hand_detector.get_landmark_array(frame, copy=False)
+        if landmarks is None:
+            return None, None
+        pixels = self.store.landmark_format == 'pixels'
+        pose = normalize_landmarks(landmarks, frame.shape[1], self.hand_detector.left_hand[:1],
+                                   self.store.mirror_left_hands and not pixels)[0]
+        return (landmarks if pixels else pose.reshape(-1)), pose
+    
+    def _display_info(self, frame, sign_name, class_id, progress, collecting):
+        """
+        Display instructions and collection progress on the frame.
+        """
+        collected = progress['collected']
         cv2.putText(frame, f"Sign '{sign_name}' (Class {class_id})", 
                     (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-        cv2.putText(frame, "Press 'c' to start collecting, 'q' to quit",
-                    (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, f"Collected: {collected_samples}/{self.num_samples}",
-                    (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        status = "Collecting - vary the hand pose" if collecting else "Press 'c' to start collecting, 'q' to quit"
+        cv2.putText(frame, status, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(frame, f"Collected: {collected}/{self.num_samples}  (near-duplicates skipped: "
+                    f"{progress['too_similar']})", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+        
+        # Progress bar
+        width = frame.shape[1] - 20
+        filled = int(width * min(collected / self.num_samples, 1.0)) if self.num_samples else width
+        cv2.rectangle(frame, (10, 105), (10 + width, 120), (0, 0, 255), 1)
+        cv2.rectangle(frame, (10, 105), (10 + filled, 120), (0, 0, 255), -1)
     
-    def save_data(self, output_dir='dataset'):
+    def save_data(self):
         """
-        Save collected data to numpy files.
+        Flush any pending samples to the dataset store and print a summary.
         """
-        if not self.dataset:
+        self.store.flush()
+        if not len(self.store):
             print("No data to save!")
             return
-            
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
-        
-        # Save individual sign data
-        signs_dir = output_path / 'signs'
-        signs_dir.mkdir(exist_ok=True)
-        
-        for sign_name, data in self.sign_data.items():
-            sign_path = signs_dir / sign_name
-            sign_path.mkdir(exist_ok=True)
-            
-            # Save features and label for this sign
-            np.save(sign_path / 'features.npy', data['features'])
-            np.save(sign_path / 'label.npy', data['label'])
-            print(f"Saved {len(data['features'])} samples for sign {sign_name}")
-        
-        # Save complete dataset
-        X = np.array(self.dataset)  # Shape: (n_samples, 63)
-        y = np.array(self.labels)   # Shape: (n_samples,)
         
-        # Save arrays
-        np.save(output_path / 'features.npy', X)
-        np.save(output_path / 'labels.npy', y)
+        labels, counts = np.unique(self.store.labels(), return_counts=True)
         print(f"\nComplete dataset:")
-        print(f"Total samples: {len(self.dataset)}")
-        print(f"Features shape: {X.shape}")
-        print(f"Labels shape: {y.shape}")
-        print(f"\nData saved in:")
-        print(f"- Complete dataset: {output_path}")
-        print(f"- Individual signs: {signs_dir}")
+        print(f"Total samples: {len(self.store)}")
+        print(f"Samples per class: {dict(zip(labels.tolist(), counts.tolist()))}")
+        print(f"\nData saved in: {self.store.root}")
         
     def get_data(self):
         """
         Return the collected data and labels.
         """
-        return np.array(self.dataset), np.array(self.labels)
\ No newline at end of file
+        self.store.flush()
+        return self.store.read(np.arange(len(self.store)))
\ No newline at end of file
@@ -0,0 +1,213 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+from config import INPUT_SHAPE, SIGNS, STORE_DIR, COLLECT_MIN_DELTA
+from dataset_store import DatasetStore
+
+REGISTRY_NAME = 'processed_videos.json'  # content hash -> video summary, kept inside the store
+
+# Per-worker state, set up once by _init_worker
+_detector = None
+_settings = None
+
+
+def load_manifest(path):
+    """
+    Reads (video path, class id) pairs from a .csv (columns: path,label) or
+    .jsonl ({"path": ..., "label": ...}) manifest. Labels may be class ids or
+    sign names; relative paths are resolved against the manifest's folder.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.jsonl':
+        with open(path) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+
+    class_ids = {name: class_id for class_id, name in SIGNS.items()}
+    entries = []
+    for row in rows:
+        label = str(row['label']).strip()
+        if label in class_ids:
+            class_id = class_ids[label]
+        elif label.isdigit() and int(label) in SIGNS:
+            class_id = int(label)
+        else:
+            raise ValueError(f"Unknown label '{label}' in {path}")
+        video = Path(row['path'])
+        entries.append((str(video if video.is_absolute() else path.parent / video), class_id))
+    return entries
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, so renamed or copied videos are recognised."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _init_worker(static_mode, mirror, frame_step, min_delta, pixel_landmarks, mirror_left_hands, known_hashes):
+    """Creates the worker's single MediaPipe instance."""
+    global _detector, _settings
+    from hand_detector import HandDetector
+
+    _detector = HandDetector(static_mode=static_mode, max_hands=1)
+    _settings = {
+        'mirror': mirror, 'frame_step': frame_step, 'min_delta': min_delta,
+        'pixel_landmarks': pixel_landmarks, 'mirror_left_hands': mirror_left_hands,
+        'known_hashes': known_hashes,
+    }
+
+
+def _process_video(path, class_id):
+    """
+    Runs hand detection over one video in a worker. Returns (path, class id,
+    content hash, samples or None if the video was processed before, frame count).
+    Samples are in the store's format and skip near-duplicate poses like
+    DataCollector does. Raises ValueError for a video that cannot be opened or
+    yields no frame, so it is reported as failed and never registered.
+    """
+    import cv2
+    from features import normalize_landmarks
+
+    digest = content_hash(path)
+    if digest in _settings['known_hashes']:
+        return path, class_id, digest, None, 0
+
+    _detector.reset()
+    samples, last_pose = [], None
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        cap.release()
+        raise ValueError(f"Could not open video {path}")
+    frames = 0
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames += 1
+            if (frames - 1) % _settings['frame_step']:
+                continue
+            if _settings['mirror']:
+                frame = cv2.flip(frame, 1)  # Match the mirrored webcam view used for collection
+            _detector.find_hands(frame, draw=False)
+            landmarks = _detector.get_landmark_array(frame, copy=False)
+            if landmarks is None:
+                continue
+            pose = normalize_landmarks(landmarks, frame.shape[1], _detector.left_hand[:1],
+                                       _settings['mirror_left_hands'])[0]
+            if last_pose is not None and np.linalg.norm(pose - last_pose, axis=-1).mean() < _settings['min_delta']:
+                continue
+            last_pose = pose
+            samples.append(landmarks.copy() if _settings['pixel_landmarks'] else pose.reshape(-1))
+    finally:
+        cap.release()
+    if not frames:
+        raise ValueError(f"No frames could be read from {path}")
+
+    samples = np.array(samples, dtype=np.float32).reshape(-1, INPUT_SHAPE)
+    return path, class_id, digest, samples, frames
+
+
+class DatasetBuilder:
+    """
+    Builds a DatasetStore from labelled recordings. Videos are processed across
+    a process pool with one HandDetector (MediaPipe graph) per worker; only the
+    main process writes to the store. Each finished video is recorded by content
+    hash in the store's registry after its samples are flushed, so re-runs skip
+    videos already processed, even if they were renamed or moved.
+    """
+    def __init__(self, store_dir=STORE_DIR, workers=None, static_mode=False, mirror=True, frame_step=1,
+                 min_delta=COLLECT_MIN_DELTA):
+        self.store = DatasetStore(store_dir)
+        self.registry_path = self.store.root / REGISTRY_NAME
+        self.registry = self._load_registry()
+        self.workers = workers or os.cpu_count() or 1
+        self.static_mode = static_mode
+        self.mirror = mirror
+        self.frame_step = max(1, frame_step)
+        self.min_delta = min_delta
+
+    def _load_registry(self):
+        try:
+            with open(self.registry_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_registry(self):
+        tmp_path = self.registry_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def build(self, entries):
+        """
+        Processes (video path, class id) entries and appends their samples to the store.
+        Returns a summary of processed, skipped and failed videos.
+        """
+        summary = {'processed': 0, 'skipped': 0, 'failed': 0, 'samples': 0}
+        initargs = (self.static_mode, self.mirror, self.frame_step, self.min_delta,
+                    self.store.landmark_format == 'pixels', self.store.mirror_left_hands, set(self.registry))
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(entries)) or 1,
+                                 initializer=_init_worker, initargs=initargs) as pool:
+            futures = {pool.submit(_process_video, path, class_id): path for path, class_id in entries}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    path, class_id, digest, samples, frames = future.result()
+                except Exception as e:
+                    print(f"Error processing {path}: {str(e)}")
+                    summary['failed'] += 1
+                    continue
+                if samples is None or digest in self.registry:  # processed before, or listed twice
+                    summary['skipped'] += 1
+                    continue
+
+                self.store.extend(samples, [class_id] * len(samples))
+                self.store.flush()
+                self.registry[digest] = {'path': path, 'label': class_id, 'frames': frames, 'samples': len(samples)}
+                self._save_registry()
+                summary['processed'] += 1
+                summary['samples'] += len(samples)
+                print(f"{path}: {len(samples)} samples of '{SIGNS[class_id]}' from {frames} frames")
+        return summary
+
+    def close(self):
+        self.store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the training dataset from labelled sign recordings.")
+    parser.add_argument('manifest', help=".csv (path,label) or .jsonl manifest of videos")
+    parser.add_argument('--store', default=STORE_DIR, help="DatasetStore directory to append to")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--static', action='store_true', help="Detect every frame independently (no tracking)")
+    parser.add_argument('--frame-step', type=int, default=1, help="Use every Nth frame")
+    parser.add_argument('--min-delta', type=float, default=COLLECT_MIN_DELTA,
+                        help="Skip poses closer than this to the last kept one (0 keeps every frame)")
+    parser.add_argument('--no-mirror', action='store_true', help="Do not flip frames horizontally")
+    args = parser.parse_args()
+
+    builder = DatasetBuilder(args.store, args.workers, args.static, not args.no_mirror, args.frame_step,
+                             args.min_delta)
+    try:
+        summary = builder.build(load_manifest(args.manifest))
+    finally:
+        builder.close()
+    print(f"\nProcessed {summary['processed']} videos ({summary['samples']} samples), "
+          f"skipped {summary['skipped']} already processed, {summary['failed']} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+from config import INPUT_SHAPE, STORE_DIR, STORE_SHARD_SIZE, MIRROR_LEFT_HANDS
+
+# One index record per sample: class label, shard number, row inside the shard
+INDEX_DTYPE = np.dtype([('label', '<i4'), ('shard', '<i4'), ('offset', '<i4')])
+
+
+class DatasetStore:
+    """
+    Append-only dataset on disk.
+    Samples are written into fixed-size memory-mapped .npy shards, and every
+    sample gets a (label, shard, offset) record in index.bin. Only rows named in
+    the index count as data, so a crash can lose at most the unflushed tail.
+    Opening an existing store resumes appending after its last sample.
+    New stores hold normalized landmarks (features.normalize_landmarks); older
+    ones hold raw pixel landmarks, recorded as 'landmarks' in meta.json.
+    """
+    def __init__(self, root=STORE_DIR, shard_size=STORE_SHARD_SIZE, feature_size=INPUT_SHAPE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.meta_path = self.root / 'meta.json'
+        self.index_path = self.root / 'index.bin'
+
+        if self.meta_path.exists():
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {'version': 1, 'shard_size': shard_size, 'feature_size': feature_size,
+                         'landmarks': 'normalized', 'mirror_left_hands': MIRROR_LEFT_HANDS}
+            self._write_meta()
+        self.shard_size = self.meta['shard_size']
+        self.feature_size = self.meta['feature_size']
+        # Stores created before features.py hold raw HandDetector output in pixels
+        self.landmark_format = self.meta.get('landmarks', 'pixels')
+        self.mirror_left_hands = self.meta.get('mirror_left_hands', False)
+
+        self.index = self._read_index()
+        self.index_file = open(self.index_path, 'ab')
+        self.pending = []  # index records not yet written to index.bin
+
+        if len(self.index):
+            self.shard_id = int(self.index['shard'][-1])
+            self.offset = int(self.index['offset'][-1]) + 1
+        else:
+            self.shard_id, self.offset = 0, 0
+        self.shard = None
+        self.readers = {}  # shard_id -> read-only memmap, opened on first read
+
+    @staticmethod
+    def exists(root=STORE_DIR):
+        """True if a store with at least one sample exists at root."""
+        index_path = Path(root) / 'index.bin'
+        return index_path.exists() and index_path.stat().st_size >= INDEX_DTYPE.itemsize
+
+    def _write_meta(self):
+        tmp_path = self.meta_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self.meta_path)
+
+    def _read_index(self):
+        if not self.index_path.exists():
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        size = self.index_path.stat().st_size
+        complete = size - size % INDEX_DTYPE.itemsize
+        if complete != size:
+            # Drop a partially written record left by a crash
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(complete)
+        return np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+
+    def shard_path(self, shard_id):
+        return self.root / f'shard_{shard_id:05d}.npy'
+
+    def _open_shard_for_write(self):
+        path = self.shard_path(self.shard_id)
+        if path.exists():
+            self.shard = np.load(path, mmap_mode='r+')
+        else:
+            self.shard = np.lib.format.open_memmap(
+                path, mode='w+', dtype=np.float32, shape=(self.shard_size, self.feature_size))
+
+    def append(self, features, label):
+        """Append one sample. Call flush() to make it durable."""
+        if self.offset >= self.shard_size:
+            self.flush()
+            self.shard = None
+            self.shard_id += 1
+            self.offset = 0
+        if self.shard is None:
+            self._open_shard_for_write()
+
+        self.shard[self.offset] = features
+        self.pending.append((label, self.shard_id, self.offset))
+        self.offset += 1
+
+    def extend(self, features, labels):
+        """Append several samples."""
+        for row, label in zip(features, labels):
+            self.append(row, label)
+
+    def flush(self):
+        """Write shard data first, then the index records that point to it."""
+        if not self.pending:
+            return
+        if self.shard is not None:
+            self.shard.flush()
+        records = np.array(self.pending, dtype=INDEX_DTYPE)
+        self.index_file.write(records.tobytes())
+        self.index_file.flush()
+        os.fsync(self.index_file.fileno())
+        self.index = np.concatenate([self.index, records])
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.index_file.close()
+        self.shard = None
+
+    def __len__(self):
+        return len(self.index) + len(self.pending)
+
+    def labels(self):
+        """Labels of all flushed samples, in append order."""
+        return self.index['label']
+
+    def count(self, label):
+        """Number of samples stored for a class, including unflushed ones."""
+        flushed = int(np.count_nonzero(self.index['label'] == label))
+        return flushed + sum(1 for record in self.pending if record[0] == label)
+
+    def _reader(self, shard_id):
+        if shard_id not in self.readers:
+            self.readers[shard_id] = np.load(self.shard_path(shard_id), mmap_mode='r')
+        return self.readers[shard_id]
+
+    def read(self, indices):
+        """Gather samples by global index into an in-memory array."""
+        indices = np.asarray(indices)
+        records = self.index[indices]
+        out = np.empty((len(indices), self.feature_size), dtype=np.float32)
+        for shard_id in np.unique(records['shard']):
+            mask = records['shard'] == shard_id
+            shard = self._reader(int(shard_id))
+            out[mask] = shard[records['offset'][mask]]
+        return out, records['label']
+
+
+class BackgroundWriter:
+    """
+    Appends samples to a DatasetStore on a background thread, so disk writes
+    never stall the capture loop. Samples are copied when queued. The store is
+    flushed every flush_every samples and by flush() and close(); while the
+    writer is open, only it should touch the store.
+    """
+    _FLUSH = object()
+
+    def __init__(self, store, flush_every=50):
+        self.store = store
+        self.flush_every = flush_every
+        self.queue = queue.Queue()
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='store-writer', daemon=True)
+        self.thread.start()
+
+    def put(self, features, label):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((np.array(features, dtype=np.float32), label))
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if item is self._FLUSH:
+                    self.store.flush()
+                    continue
+                self.store.append(*item)
+                self.written += 1
+                if self.written % self.flush_every == 0:
+                    self.store.flush()
+            except Exception as e:
+                self.error = e  # reported to the producer on its next put()
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued sample is written and flushed."""
+        self.queue.put(self._FLUSH)
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
@@ -0,0 +1,177 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from config import MODEL_PATH, EXPORT_QUANTIZATION, EXPORT_CALIBRATION_SAMPLES, EXPORT_MAX_ACCURACY_DROP
+from features import load_feature_pipeline
+from model_metadata import save_model_metadata
+
+EXPORT_FORMATS = ['tflite', 'onnx']
+
+
+def load_export_data(model_path=MODEL_PATH, calibration_samples=EXPORT_CALIBRATION_SAMPLES):
+    """
+    (calibration features, validation features, validation labels) built with the
+    model's own feature pipeline and the trainer's train/validation split,
+    or None if there is no dataset.
+    """
+    from model_trainer import open_dataset, split_indices, to_points
+
+    read_rows, labels, pixel_landmarks, _ = open_dataset()
+    if read_rows is None:
+        return None
+    pipeline = load_feature_pipeline(model_path)
+    train_idx, val_idx = split_indices(len(labels))
+
+    def features(indices):
+        landmarks, y = read_rows(np.sort(indices))
+        return pipeline.expand(to_points(pipeline, landmarks, pixel_landmarks)), np.asarray(y)
+
+    calibration_idx = np.random.default_rng(0).choice(train_idx, min(calibration_samples, len(train_idx)),
+                                                      replace=False)
+    return (features(calibration_idx)[0], *features(val_idx))
+
+
+def convert_tflite(model, quantization, calibration):
+    """
+    TFLite flatbuffer of a Keras model. 'dynamic' quantizes the weights to int8;
+    'int8' also quantizes activations, calibrated on the calibration features.
+    Input and output stay float32 so TFLiteEngine needs no changes.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization in ('dynamic', 'int8'):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        def representative_dataset():
+            for row in calibration:
+                yield [row.reshape(1, -1).astype(np.float32)]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    return converter.convert()
+
+
+def convert_onnx(model, output_path):
+    """ONNX export through tf2onnx (optional dependency)."""
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None, model.input_shape[-1]), tf.float32, name='features'),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=output_path)
+
+
+def evaluate(engine, features, labels, repeats=200):
+    """Validation accuracy and median single-sample latency in milliseconds."""
+    probabilities = engine.predict(features)
+    accuracy = float(np.mean(np.argmax(probabilities, axis=1) == labels))
+    rows = features[np.arange(repeats) % len(features)]
+    for row in rows[:20]:
+        engine.predict(row[None])  # warm up
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        engine.predict(row[None])
+        latencies.append(time.perf_counter() - start)
+    return accuracy, float(np.median(latencies) * 1000.0)
+
+
+def _replace_or_discard(tmp_path, path, accepted):
+    """Move an accepted export into place; otherwise drop it and any stale artifact from an older model."""
+    if accepted:
+        os.replace(tmp_path, path)
+        return
+    for stale in (tmp_path, path):
+        if os.path.exists(stale):
+            os.remove(stale)
+
+
+def export_models(model=None, model_path=MODEL_PATH, formats=EXPORT_FORMATS, quantization=EXPORT_QUANTIZATION,
+                  max_accuracy_drop=EXPORT_MAX_ACCURACY_DROP, calibration_samples=EXPORT_CALIBRATION_SAMPLES):
+    """
+    Exports the trained model to TFLite and/or ONNX, then compares every
+    artifact with the .h5 model on the validation split. Exports that lose
+    more than max_accuracy_drop accuracy are rejected and removed. Size,
+    latency and accuracy of each artifact are saved in the model metadata,
+    where the 'auto' inference backend picks the fastest accepted one.
+    Returns the manifest, or None if there is no dataset to evaluate on.
+    """
+    import tensorflow as tf
+    from predictor import INFERENCE_ENGINES, NumpyEngine
+
+    data = load_export_data(model_path, calibration_samples)
+    if data is None:
+        print("Dataset not found; exports need validation data for the accuracy check.")
+        return None
+    calibration, features, labels = data
+    if model is None:
+        model = tf.keras.models.load_model(model_path)
+
+    reference_accuracy, reference_latency = evaluate(NumpyEngine(model_path), features, labels)
+    manifest = {
+        'numpy': {'path': model_path, 'quantization': 'none', 'size_bytes': os.path.getsize(model_path),
+                  'latency_ms': reference_latency, 'accuracy': reference_accuracy, 'accuracy_drop': 0.0,
+                  'accepted': True},
+    }
+
+    for export_format in formats:
+        path = f"{os.path.splitext(model_path)[0]}.{export_format}"  # TFLITE_MODEL_PATH / ONNX_MODEL_PATH
+        tmp_path = path + '.tmp'
+        entry = {'path': path, 'quantization': quantization if export_format == 'tflite' else 'none',
+                 'size_bytes': None, 'latency_ms': None, 'accuracy': None, 'accuracy_drop': None,
+                 'accepted': False}
+        manifest[export_format] = entry
+        try:
+            if export_format == 'tflite':
+                with open(tmp_path, 'wb') as f:
+                    f.write(convert_tflite(model, quantization, calibration))
+            else:
+                convert_onnx(model, tmp_path)
+            accuracy, latency = evaluate(INFERENCE_ENGINES[export_format](tmp_path), features, labels)
+        except ImportError as e:
+            entry['reason'] = f"missing dependency: {e.name}"
+            _replace_or_discard(tmp_path, path, False)
+            continue
+        except Exception as e:
+            entry['reason'] = f"export failed: {e}"
+            _replace_or_discard(tmp_path, path, False)
+            continue
+
+        entry.update(size_bytes=os.path.getsize(tmp_path), latency_ms=latency, accuracy=accuracy,
+                     accuracy_drop=reference_accuracy - accuracy)
+        entry['accepted'] = entry['accuracy_drop'] <= max_accuracy_drop
+        if not entry['accepted']:
+            entry['reason'] = f"accuracy dropped by {entry['accuracy_drop']:.4f} (limit {max_accuracy_drop})"
+        _replace_or_discard(tmp_path, path, entry['accepted'])
+
+    save_model_metadata(model_path, exports=manifest)
+    print_manifest(manifest)
+    return manifest
+
+
+def print_manifest(manifest):
+    print(f"\n{'artifact':<8} {'quant':<8} {'size KB':>9} {'latency ms':>11} {'accuracy':>9} {'drop':>8}  status")
+    for name, entry in manifest.items():
+        if entry['latency_ms'] is None:
+            print(f"{name:<8} {entry['quantization']:<8} {'-':>9} {'-':>11} {'-':>9} {'-':>8}  {entry['reason']}")
+            continue
+        status = 'ok' if entry['accepted'] else f"rejected: {entry['reason']}"
+        print(f"{name:<8} {entry['quantization']:<8} {entry['size_bytes'] / 1024:9.1f} {entry['latency_ms']:11.3f} "
+              f"{entry['accuracy']:9.4f} {entry['accuracy_drop']:+8.4f}  {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the trained model to quantized TFLite and ONNX.")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--formats', nargs='+', choices=EXPORT_FORMATS, default=EXPORT_FORMATS)
+    parser.add_argument('--quantization', choices=['int8', 'dynamic', 'none'], default=EXPORT_QUANTIZATION)
+    parser.add_argument('--max-accuracy-drop', type=float, default=EXPORT_MAX_ACCURACY_DROP)
+    parser.add_argument('--calibration-samples', type=int, default=EXPORT_CALIBRATION_SAMPLES)
+    args = parser.parse_args()
+    export_models(model_path=args.model, formats=args.formats, quantization=args.quantization,
+                  max_accuracy_drop=args.max_accuracy_drop, calibration_samples=args.calibration_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import numpy as np
+from config import CAMERA_WIDTH, MIRROR_LEFT_HANDS, PAIRWISE_FEATURES, JOINT_ANGLE_FEATURES
+from model_metadata import load_model_metadata
+
+NUM_LANDMARKS = 21
+RAW_VERSION = 1       # landmarks exactly as HandDetector reports them (models trained before features.py)
+FEATURE_VERSION = 2   # bump whenever normalize() or expand() change what a model sees
+
+WRIST = 0
+MIDDLE_MCP = 9  # wrist -> middle finger knuckle sets the hand scale
+LEGACY_FRAME_WIDTH = 640  # default cv2.VideoCapture resolution the pixel-unit datasets were collected at
+
+# Landmark chains from the wrist to each fingertip
+FINGERS = [
+    (0, 1, 2, 3, 4),
+    (0, 5, 6, 7, 8),
+    (0, 9, 10, 11, 12),
+    (0, 13, 14, 15, 16),
+    (0, 17, 18, 19, 20),
+]
+PAIRS = np.array(np.triu_indices(NUM_LANDMARKS, k=1))  # (2, 210) landmark index pairs
+JOINTS = np.array([finger[i:i + 3] for finger in FINGERS for i in range(3)])  # (15, 3) bone triples
+
+
+def normalize_landmarks(landmarks, frame_width=CAMERA_WIDTH, left_hand=None, mirror_left_hands=MIRROR_LEFT_HANDS):
+    """
+    Canonical hand pose from HandDetector landmarks, shape (n, 63) or (63,).
+
+    z is brought to pixel units (MediaPipe reports it relative to the frame
+    width), the wrist is moved to the origin and the pose is scaled so the
+    wrist to middle-knuckle distance is 1, which removes the dependence on
+    camera resolution, hand position and distance to the camera. With
+    mirror_left_hands, hands flagged in left_hand are mirrored to look like
+    right hands. Returns float32 points of shape (n, 21, 3).
+    """
+    points = np.array(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+    points[:, :, 2] *= frame_width
+    if mirror_left_hands and left_hand is not None:
+        points[np.asarray(left_hand, dtype=bool), :, 0] *= -1
+    points -= points[:, WRIST:WRIST + 1]
+    scale = np.linalg.norm(points[:, MIDDLE_MCP], axis=1)
+    points /= np.maximum(scale, 1e-6)[:, None, None]
+    return points
+
+
+class FeaturePipeline:
+    """
+    Turns landmarks into the feature vectors a model is trained on.
+
+    Version 2 features are the normalized landmarks followed by the distances
+    between every pair of landmarks and the bend angle of every finger joint,
+    all computed in batched NumPy. Version 1 passes landmarks through unchanged
+    for models trained on raw pixel coordinates.
+
+    The spec is saved next to the model (see model_metadata.py) and loaded by
+    the predictor, so inference always builds the features the model was
+    trained on.
+    """
+    def __init__(self, version=FEATURE_VERSION, pairwise_distances=PAIRWISE_FEATURES,
+                 joint_angles=JOINT_ANGLE_FEATURES, mirror_left_hands=MIRROR_LEFT_HANDS):
+        if version not in (RAW_VERSION, FEATURE_VERSION):
+            raise ValueError(f"Unsupported feature version {version}; this code builds versions "
+                             f"{RAW_VERSION} and {FEATURE_VERSION}")
+        self.version = version
+        self.pairwise_distances = pairwise_distances and version > RAW_VERSION
+        self.joint_angles = joint_angles and version > RAW_VERSION
+        self.mirror_left_hands = mirror_left_hands and version > RAW_VERSION
+        self.input_size = NUM_LANDMARKS * 3
+        self.output_size = (self.input_size + PAIRS.shape[1] * self.pairwise_distances
+                            + len(JOINTS) * self.joint_angles)
+
+    def spec(self):
+        return {
+            'version': self.version,
+            'pairwise_distances': self.pairwise_distances,
+            'joint_angles': self.joint_angles,
+            'mirror_left_hands': self.mirror_left_hands,
+            'input_size': self.input_size,
+            'output_size': self.output_size,
+        }
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec['version'], spec['pairwise_distances'], spec['joint_angles'], spec['mirror_left_hands'])
+
+    def normalize(self, landmarks, frame_width=CAMERA_WIDTH, left_hand=None):
+        if self.version == RAW_VERSION:
+            return np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        return normalize_landmarks(landmarks, frame_width, left_hand, self.mirror_left_hands)
+
+    def expand(self, points):
+        """Feature matrix (n, output_size) from normalized points (n, 21, 3)."""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 3)
+        parts = [points.reshape(len(points), -1)]
+        if self.pairwise_distances:
+            parts.append(np.linalg.norm(points[:, PAIRS[0]] - points[:, PAIRS[1]], axis=2))
+        if self.joint_angles:
+            incoming = points[:, JOINTS[:, 1]] - points[:, JOINTS[:, 0]]
+            outgoing = points[:, JOINTS[:, 2]] - points[:, JOINTS[:, 1]]
+            cosine = (incoming * outgoing).sum(axis=2) / np.maximum(
+                np.linalg.norm(incoming, axis=2) * np.linalg.norm(outgoing, axis=2), 1e-6)
+            parts.append(np.arccos(np.clip(cosine, -1.0, 1.0)))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts, axis=1).astype(np.float32, copy=False)
+
+    def transform(self, landmarks, frame_width=CAMERA_WIDTH, left_hand=None):
+        """Feature matrix (n, output_size) from HandDetector landmarks (n, 63)."""
+        return self.expand(self.normalize(landmarks, frame_width, left_hand))
+
+
+def load_feature_pipeline(model_path):
+    """The pipeline a model was trained with; version 1 (raw landmarks) if it has no metadata."""
+    spec = load_model_metadata(model_path).get('features')
+    return FeaturePipeline.from_spec(spec) if spec else FeaturePipeline(RAW_VERSION)
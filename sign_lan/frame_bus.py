@@ -0,0 +1,520 @@
+import argparse
+import multiprocessing
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+from config import (SIGNS, CAMERA_SOURCE, MAX_HANDS, ADAPTIVE_DETECTION, INFERENCE_BACKEND, SAMPLES_PER_SIGN,
+                    STORE_DIR, COLLECT_INTERVAL_MS, COLLECT_MIN_DELTA, FRAME_BUS_SLOTS)
+from features import NUM_LANDMARKS, normalize_landmarks
+
+START_METHOD = 'spawn'   # MediaPipe and TensorFlow are not fork-safe
+POLL_INTERVAL = 0.001    # seconds between checks for a new record
+CAMERA_OPEN_TIMEOUT = 30  # seconds to wait for the camera process to deliver its first frame
+OVERLAY_LINES = 3
+OVERLAY_DTYPE = np.dtype([('frame_seq', np.int64), ('lines', 'U96', (OVERLAY_LINES,))])
+
+
+def landmark_dtype(max_hands):
+    """One detection result: the frame it came from and up to max_hands hands in HandDetector's layout."""
+    return np.dtype([
+        ('frame_seq', np.int64),
+        ('frame_width', np.int32),
+        ('num_hands', np.int32),
+        ('left_hand', np.bool_, (max_hands,)),
+        ('landmarks', np.float32, (max_hands, NUM_LANDMARKS * 3)),
+    ])
+
+
+class SharedRing:
+    """
+    A ring of fixed-size records in shared memory, written by one process and
+    read by any number of others.
+
+    Every slot carries the sequence number of the record it holds. The writer
+    marks a slot as being written (-1), fills it in place and then publishes
+    its sequence number. Readers get a view of the slot without copying and
+    check valid() once they are done with it: if the writer lapped them in the
+    meantime the result is discarded. A reader that falls more than slots
+    records behind loses the oldest ones, like the threaded pipeline's
+    RingBuffer.
+    """
+    HEADER = 2  # int64 fields before the per-slot arrays: latest sequence number, closed flag
+
+    def __init__(self, shape, dtype, slots=FRAME_BUS_SLOTS, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        header_size = 8 * (self.HEADER + 2 * slots)
+        record_size = int(np.prod(self.shape, dtype=np.int64)) * self.dtype.itemsize
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(create=True, size=header_size + record_size * slots)
+        else:
+            # Processes started by multiprocessing share one resource tracker, which
+            # the creator's unlink() clears, so attaching needs no extra bookkeeping
+            self.memory = shared_memory.SharedMemory(name=name)
+
+        buffer = self.memory.buf
+        self.header = np.ndarray(self.HEADER, np.int64, buffer)
+        self.sequences = np.ndarray(slots, np.int64, buffer, offset=8 * self.HEADER)
+        self.timestamps = np.ndarray(slots, np.float64, buffer, offset=8 * (self.HEADER + slots))
+        self.records = np.ndarray((slots, *self.shape), self.dtype, buffer, offset=header_size)
+        if self.owner:
+            self.header[:] = 0
+            self.sequences[:] = 0
+
+    def spec(self):
+        """Picklable description for attach() in another process."""
+        return {'name': self.memory.name, 'shape': self.shape, 'dtype': self.dtype, 'slots': self.slots}
+
+    @classmethod
+    def attach(cls, spec):
+        return cls(spec['shape'], spec['dtype'], spec['slots'], spec['name'])
+
+    def claim(self):
+        """(sequence number, writable view of its slot) for the next record; publish() it once filled."""
+        sequence = int(self.header[0]) + 1
+        slot = sequence % self.slots
+        self.sequences[slot] = -1
+        return sequence, self.records[slot, ...]
+
+    def publish(self, sequence, timestamp):
+        slot = sequence % self.slots
+        self.timestamps[slot] = timestamp
+        self.sequences[slot] = sequence
+        self.header[0] = sequence
+
+    def write(self, record, timestamp):
+        sequence, slot = self.claim()
+        slot[...] = record
+        self.publish(sequence, timestamp)
+        return sequence
+
+    def latest(self):
+        return int(self.header[0])
+
+    def read(self, sequence):
+        """(view, timestamp in ms) of a record, or None if it is not published or was overwritten."""
+        if not self.valid(sequence):
+            return None
+        slot = sequence % self.slots
+        return self.records[slot, ...], float(self.timestamps[slot])
+
+    def valid(self, sequence):
+        return sequence > 0 and int(self.sequences[sequence % self.slots]) == sequence
+
+    def wait(self, after, timeout=0.1):
+        """The latest sequence number once it is past after, or None on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            latest = self.latest()
+            if latest > after:
+                return latest
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    @property
+    def closed(self):
+        """Set by the writer when it will publish nothing more."""
+        return bool(self.header[1])
+
+    def mark_closed(self):
+        self.header[1] = 1
+
+    def close(self):
+        self.header = self.sequences = self.timestamps = self.records = None
+        try:
+            self.memory.close()
+        except BufferError:
+            pass  # a caller still holds a view; the mapping goes away with the process
+        if self.owner:
+            self.memory.unlink()
+
+
+class FrameBus:
+    """
+    The rings shared by the camera producer and its subscribers: camera frames,
+    detected landmarks (tagged with their frame's sequence number) and overlay
+    text lines that the preview draws over the frames.
+    """
+    RINGS = ('frames', 'landmarks', 'overlay')
+
+    def __init__(self, rings):
+        self.rings = rings
+        for name in self.RINGS:
+            setattr(self, name, rings[name])
+
+    @classmethod
+    def attach(cls, specs):
+        return cls({name: SharedRing.attach(spec) for name, spec in specs.items()})
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+
+
+def _keys(commands):
+    """Key codes the preview forwarded since the last call."""
+    keys = []
+    while True:
+        try:
+            keys.append(commands.get_nowait())
+        except queue.Empty:
+            return keys
+
+
+def run_camera(ready, stop, source, mirror, slots):
+    """
+    Producer process: owns the camera and writes every frame straight into the
+    frames ring (mirrored in the same pass). Sends the ring's spec through
+    ready, or None if the camera could not be opened.
+    """
+    import cv2
+    from capture import Camera
+
+    camera = Camera(source)
+    if not camera.is_opened():
+        ready.put(None)
+        return
+    width, height = camera.resolution
+    frames = SharedRing((height, width, 3), np.uint8, slots)
+    ready.put(frames.spec())
+    try:
+        while not stop.is_set():
+            ret, frame = camera.read()
+            if not ret:
+                break
+            if frame.shape != frames.shape:
+                continue  # the driver changed the frame size; the ring cannot hold it
+            timestamp = time.monotonic() * 1000.0
+            sequence, slot = frames.claim()
+            if mirror:
+                cv2.flip(frame, 1, dst=slot)
+            else:
+                np.copyto(slot, frame)
+            frames.publish(sequence, timestamp)
+        frames.mark_closed()
+        stop.wait()  # subscribers may still be attaching to the ring
+    finally:
+        camera.release()
+        frames.close()
+
+
+def run_detector(specs, stop, max_hands, adaptive):
+    """Subscriber process: runs HandDetector on the newest frame and publishes its landmarks."""
+    from hand_detector import HandDetector
+
+    bus = FrameBus.attach(specs)
+    detector = HandDetector(max_hands=max_hands, adaptive=adaptive)
+    frames, landmarks = bus.frames, bus.landmarks
+    last = 0
+    try:
+        while not stop.is_set() and not frames.closed:
+            latest = frames.wait(last)
+            if latest is None:
+                continue
+            last = latest
+            item = frames.read(latest)
+            if item is None:
+                continue
+            frame, timestamp = item
+            detector.find_hands(frame, draw=False)
+            batch = detector.get_landmark_batch(frame)
+            frame_width = frame.shape[1]
+            del frame, item
+            if not frames.valid(latest):
+                continue  # the camera overwrote the frame while it was being read
+
+            sequence, record = landmarks.claim()
+            count = 0 if batch is None else len(batch)
+            record['frame_seq'] = latest
+            record['frame_width'] = frame_width
+            record['num_hands'] = count
+            if count:
+                record['landmarks'][:count] = batch
+                record['left_hand'][:count] = detector.left_hand[:count]
+            del record
+            landmarks.publish(sequence, timestamp)
+        landmarks.mark_closed()
+    finally:
+        detector.release()
+        bus.close()
+
+
+def run_predictor(specs, stop, commands, backend):
+    """
+    Subscriber process: classifies every landmark record in order, decodes the
+    text and publishes it as overlay lines. Keys pressed in the preview edit
+    the text as in SignPredictor.run_prediction; 'q' stops the bus.
+    """
+    from predictor import SignPredictor
+
+    bus = FrameBus.attach(specs)
+    # Detection already happened in the detector process
+    predictor = SignPredictor(backend=backend, hand_detector=object(), verbose=False)
+    landmarks, overlay = bus.landmarks, bus.overlay
+    last = 0
+    try:
+        while not stop.is_set() and not landmarks.closed:
+            if not all(predictor.handle_key(key) for key in _keys(commands)):
+                stop.set()
+                break
+            latest = landmarks.wait(last)
+            if latest is None:
+                continue
+            for sequence in range(max(last + 1, latest - landmarks.slots + 1), latest + 1):
+                item = landmarks.read(sequence)
+                if item is None:
+                    continue
+                record, timestamp = item
+                features = None
+                if record['num_hands']:
+                    features = predictor.features.transform(record['landmarks'][:1], int(record['frame_width']),
+                                                            record['left_hand'][:1])
+                frame_seq = int(record['frame_seq'])
+                del record, item
+                if not landmarks.valid(sequence):
+                    continue
+                probabilities = predictor.engine.predict(features)[0] if features is not None else None
+                sign, confidence = predictor.update_word(probabilities, timestamp)
+                suggestions = predictor.words.suggestions() if predictor.words is not None else []
+                overlay.write((frame_seq, [
+                    f"Predicted: {sign} ({confidence:.2f})" if sign is not None else '',
+                    f"Word: {predictor.text()}",
+                    f"Suggestions: {'  '.join(suggestions)}" if suggestions else '',
+                ]), timestamp)
+            last = latest
+    finally:
+        bus.close()
+
+
+def run_recorder(specs, stop, commands, class_id, sign_name, num_samples, store_dir, min_interval_ms, min_delta):
+    """
+    Subscriber process: records samples of one sign from the landmark records
+    into the DatasetStore, with DataCollector's rate limit and near-duplicate
+    filter. Starts on 'c' in the preview; 'q' skips the sign.
+    """
+    from dataset_store import DatasetStore, BackgroundWriter
+
+    bus = FrameBus.attach(specs)
+    store = DatasetStore(store_dir)
+    writer = BackgroundWriter(store)
+    landmarks, overlay = bus.landmarks, bus.overlay
+    pixels = store.landmark_format == 'pixels'
+    collected, too_similar = store.count(class_id), 0
+    collecting = False
+    last_time, last_pose = None, None
+    last = landmarks.latest()
+    _keys(commands)  # drop keys pressed before this sign
+    try:
+        if collected >= num_samples:
+            print(f"\nSign '{sign_name}' already has {num_samples} samples, skipping")
+            return
+        while collected < num_samples and not stop.is_set() and not landmarks.closed:
+            keys = [key & 0xFF for key in _keys(commands)]
+            if ord('q') in keys:
+                break
+            if ord('c') in keys:
+                collecting = True
+            latest = landmarks.wait(last)
+            if latest is None:
+                continue
+            last = latest
+            item = landmarks.read(latest)
+            if item is None:
+                continue
+            record, timestamp = item
+            if (collecting and record['num_hands'] and
+                    (last_time is None or timestamp - last_time >= min_interval_ms)):
+                sample = record['landmarks'][0].copy()
+                pose = normalize_landmarks(sample, int(record['frame_width']), record['left_hand'][:1],
+                                           store.mirror_left_hands and not pixels)[0]
+                if landmarks.valid(latest):  # otherwise the detector overwrote it while it was copied
+                    if last_pose is not None and np.linalg.norm(pose - last_pose, axis=-1).mean() < min_delta:
+                        too_similar += 1
+                    else:
+                        writer.put(sample if pixels else pose.reshape(-1), class_id)
+                        collected += 1
+                        last_time, last_pose = timestamp, pose
+            frame_seq = int(record['frame_seq'])
+            del record, item
+            overlay.write((frame_seq, [
+                f"Sign '{sign_name}' (Class {class_id}): {collected}/{num_samples}",
+                "Collecting - vary the hand pose" if collecting else "Press 'c' to start collecting, 'q' to skip",
+                f"Near-duplicates skipped: {too_similar}" if too_similar else '',
+            ]), timestamp)
+        print(f"'{sign_name}': {collected} samples ({too_similar} near-duplicates skipped)")
+    finally:
+        writer.close()
+        store.close()
+        overlay.write((0, [''] * OVERLAY_LINES), time.monotonic() * 1000.0)
+        bus.close()
+
+
+def run_preview(specs, stop, commands, title):
+    """
+    Subscriber process: shows the newest frame with the latest landmarks and
+    overlay lines, and forwards key presses to the consumer. ESC stops the bus.
+    """
+    import cv2
+
+    bus = FrameBus.attach(specs)
+    frames, landmarks, overlay = bus.frames, bus.landmarks, bus.overlay
+    canvas = np.empty(frames.shape, dtype=np.uint8)  # frames stay untouched for the other subscribers
+    last = 0
+    try:
+        while not stop.is_set():
+            key = cv2.waitKey(1)
+            if key == 27:  # ESC
+                stop.set()
+                break
+            if key != -1:
+                commands.put(key)
+            latest = frames.wait(last, timeout=0.03)
+            if latest is None:
+                if frames.closed:
+                    break
+                continue
+            last = latest
+            item = frames.read(latest)
+            if item is None:
+                continue
+            np.copyto(canvas, item[0])
+            del item
+            if not frames.valid(latest):
+                continue
+
+            detection = landmarks.read(landmarks.latest())
+            if detection is not None:
+                record = detection[0]
+                for hand in record['landmarks'][:int(record['num_hands'])]:
+                    for x, y, _ in hand.reshape(NUM_LANDMARKS, 3):
+                        cv2.circle(canvas, (int(x), int(y)), 3, (0, 0, 255), -1)
+                del record
+            del detection
+            text = overlay.read(overlay.latest())
+            if text is not None:
+                for i, line in enumerate(text[0]['lines']):
+                    if line:
+                        cv2.putText(canvas, str(line), (10, 50 * (i + 1)), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                                    (0, 255, 0), 2)
+            del text
+            cv2.imshow(title, canvas)
+    finally:
+        cv2.destroyAllWindows()
+        bus.close()
+
+
+class FrameBusSession:
+    """
+    Runs the camera, detection and preview as separate processes around one
+    FrameBus, so MediaPipe, the classifier and the UI each get their own core
+    and interpreter. start() launches the camera producer, the detector and the
+    preview; predict() and record() add the consumer for prediction or data
+    collection and block until it finishes, and stop() ends everything.
+    The camera process creates the frames ring once it knows the real frame
+    size; the session creates the others and removes them when it stops.
+    """
+    def __init__(self, source=CAMERA_SOURCE, max_hands=MAX_HANDS, slots=FRAME_BUS_SLOTS, mirror=True,
+                 title='Sign Language Prediction'):
+        self.context = multiprocessing.get_context(START_METHOD)
+        self.source = source
+        self.max_hands = max_hands
+        self.slots = slots
+        self.mirror = mirror
+        self.title = title
+        self.stop_event = self.context.Event()
+        self.commands = self.context.Queue()  # key codes from the preview to the consumer
+        self.landmarks = SharedRing((), landmark_dtype(max_hands), slots)
+        self.overlay = SharedRing((), OVERLAY_DTYPE, slots)
+        self.specs = None
+        self.processes = []
+
+    def _start(self, target, *args):
+        process = self.context.Process(target=target, args=(self.specs, self.stop_event, *args), daemon=True)
+        process.start()
+        self.processes.append(process)
+        return process
+
+    def start(self):
+        """Start the camera, detector and preview. Returns False if the camera could not be opened."""
+        ready = self.context.Queue()
+        camera = self.context.Process(target=run_camera, daemon=True,
+                                      args=(ready, self.stop_event, self.source, self.mirror, self.slots))
+        camera.start()
+        self.processes.append(camera)
+        try:
+            frames_spec = ready.get(timeout=CAMERA_OPEN_TIMEOUT)
+        except queue.Empty:
+            frames_spec = None
+        if frames_spec is None:
+            print("Error: Could not open the camera.")
+            self.stop()
+            return False
+
+        self.specs = {'frames': frames_spec, 'landmarks': self.landmarks.spec(), 'overlay': self.overlay.spec()}
+        self._start(run_detector, self.max_hands, ADAPTIVE_DETECTION)
+        self._start(run_preview, self.commands, self.title)
+        return True
+
+    def _wait(self, process):
+        while process.is_alive() and not self.stop_event.is_set():
+            process.join(0.1)
+        process.join(timeout=2.0)
+
+    def predict(self, backend=INFERENCE_BACKEND):
+        """Classify the detected hands until 'q' is pressed in the preview or the camera stops."""
+        self._wait(self._start(run_predictor, self.commands, backend))
+
+    def record(self, class_id, num_samples=SAMPLES_PER_SIGN, store_dir=STORE_DIR,
+               min_interval_ms=COLLECT_INTERVAL_MS, min_delta=COLLECT_MIN_DELTA):
+        """Record one sign into the dataset store; returns once it has enough samples or was skipped."""
+        self._wait(self._start(run_recorder, self.commands, class_id, SIGNS[class_id], num_samples, store_dir,
+                               min_interval_ms, min_delta))
+
+    @property
+    def stopped(self):
+        return self.stop_event.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.landmarks.close()
+        self.overlay.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run prediction or data collection on the shared-memory frame bus.")
+    parser.add_argument('command', choices=['predict', 'collect'])
+    parser.add_argument('--source', default=CAMERA_SOURCE, help="Camera index or video file")
+    parser.add_argument('--backend', default=INFERENCE_BACKEND)
+    args = parser.parse_args()
+
+    with FrameBusSession(args.source) as session:
+        if not session.start():
+            return
+        if args.command == 'predict':
+            session.predict(args.backend)
+            return
+        for class_id, sign_name in SIGNS.items():
+            if session.stopped:
+                break
+            print(f"\nCollecting data for sign '{sign_name}' (press 'c' in the preview to start, 'q' to skip)")
+            session.record(class_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
+from contextlib import nullcontext
 import cv2
 import mediapipe as mp
 import numpy as np
 
+NUM_LANDMARKS = 21
+
+MOTION_FRAME_SIZE = (64, 48)  # Downscaled frame used for motion gating
+
 class HandDetector:
-    def __init__(self, static_mode=False, max_hands=1, detection_confidence=0.5, tracking_confidence=0.5):
+    def __init__(self, static_mode=False, max_hands=1, detection_confidence=0.5, tracking_confidence=0.5,
+                 adaptive=False, motion_threshold=0.01, max_skipped_frames=15, roi_margin=0.35):
+        """
+        With adaptive=True, frames with almost no motion reuse the previous result
+        (at most max_skipped_frames in a row) and detection runs on a crop around
+        the last hand, widened by roi_margin. motion_threshold is the fraction of
+        downscaled pixels that must change for a frame to count as moving.
+        """
         self.static_mode = static_mode
         self.max_hands = max_hands
         self.detection_confidence = detection_confidence
@@ -17,14 +29,44 @@ class HandDetector:
             min_tracking_confidence=self.tracking_confidence
         )
         self.mp_draw = mp.solutions.drawing_utils
+        self.results = None
+        
+        # Reused across frames: x and y in pixels, z as reported by MediaPipe
+        self.landmark_buffer = np.zeros((self.max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self.left_hand = np.zeros(self.max_hands, dtype=bool)  # MediaPipe handedness of each buffered hand
+        self.num_hands = 0
+        
+        # Adaptive detection state
+        self.adaptive = adaptive
+        self.motion_threshold = motion_threshold
+        self.max_skipped_frames = max_skipped_frames
+        self.roi_margin = roi_margin
+        self.reference_frame = None
+        self.skipped_in_row = 0
+        self.hand_box = None  # (x0, y0, x1, y1) in pixels of the last detected hands
+        
+        # Reused RGB frame for MediaPipe, reallocated only when the frame size changes
+        self.rgb_buffer = None
+        # Full-frame sized backing store for ROI crops; each crop is a contiguous view into it
+        self.crop_buffer = None
+        
+        # Optional Instrumentation (see instrumentation.py) timing cvtColor and hands.process
+        # and counting full, ROI and skipped detections
+        self.instrumentation = None
         
     def find_hands(self, img, draw=True):
         """
         Finds hands in an image and optionally draws the landmarks.
         Returns the image with landmarks.
         """
-        img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(img_rgb)
+        if self.adaptive:
+            self._adaptive_detect(img)
+        else:
+            with self._stage('cvtColor'):
+                img_rgb = self._to_rgb(img)
+            with self._stage('hands.process'):
+                self.results = self.hands.process(img_rgb)
+            self._count('detection_full')
         
         if self.results.multi_hand_landmarks and draw:
             for hand_landmarks in self.results.multi_hand_landmarks:
@@ -36,32 +78,159 @@ class HandDetector:
         
         return img
     
-    def find_positions(self, img, hand_number=0):
+    def _to_rgb(self, img):
+        """BGR to RGB into the reused buffer (MediaPipe is done with it before the next frame)."""
+        if self.rgb_buffer is None or self.rgb_buffer.shape != img.shape:
+            self.rgb_buffer = np.empty_like(img)
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
+    
+    def _crop_to_rgb(self, img, x0, y0, x1, y1):
+        """BGR to RGB of a crop, written into a view of the full-frame crop buffer."""
+        if self.crop_buffer is None or self.crop_buffer.size < img.size:
+            self.crop_buffer = np.empty(img.size, dtype=img.dtype)
+        crop = img[y0:y1, x0:x1]
+        dst = self.crop_buffer[:crop.size].reshape(crop.shape)
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=dst)
+    
+    def _stage(self, name):
+        return self.instrumentation.stage(name) if self.instrumentation else nullcontext()
+    
+    def _count(self, name):
+        if self.instrumentation:
+            self.instrumentation.count(name)
+    
+    def _adaptive_detect(self, img):
+        """Runs MediaPipe only when the scene moved, and on the tracked ROI when possible."""
+        small = cv2.resize(img, MOTION_FRAME_SIZE, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        
+        if (self.results is not None and self.reference_frame is not None
+                and self.skipped_in_row < self.max_skipped_frames):
+            diff = cv2.absdiff(gray, self.reference_frame)
+            moving = np.count_nonzero(diff > 25) / diff.size
+            if moving < self.motion_threshold:
+                self.skipped_in_row += 1
+                self._count('detection_skipped')
+                return
+        
+        self.reference_frame = gray
+        self.skipped_in_row = 0
+        
+        if self.hand_box is not None and self._detect_in_roi(img):
+            self._count('detection_roi')
+        else:
+            with self._stage('cvtColor'):
+                img_rgb = self._to_rgb(img)
+            with self._stage('hands.process'):
+                self.results = self.hands.process(img_rgb)
+            self._count('detection_full')
+        
+        self.hand_box = self._bounding_box(img)
+    
+    def _detect_in_roi(self, img):
         """
-        Returns a list of [id, x, y, z] for each landmark of the specified hand.
+        Runs detection on a crop around the last hand box and maps the landmarks
+        back to full-frame coordinates. Returns False if no hand was found.
         """
-        landmarks_list = []
+        height, width = img.shape[:2]
+        x0, y0, x1, y1 = self.hand_box
+        size = max(x1 - x0, y1 - y0) * (1 + 2 * self.roi_margin)
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        x0, x1 = max(int(cx - size / 2), 0), min(int(cx + size / 2), width)
+        y0, y1 = max(int(cy - size / 2), 0), min(int(cy + size / 2), height)
+        if x1 - x0 < 32 or y1 - y0 < 32:
+            return False
         
-        if self.results.multi_hand_landmarks:
-            if len(self.results.multi_hand_landmarks) > hand_number:
-                hand = self.results.multi_hand_landmarks[hand_number]
-                for id, landmark in enumerate(hand.landmark):
-                    height, width, _ = img.shape
-                    x, y, z = landmark.x * width, landmark.y * height, landmark.z
-                    landmarks_list.append([id, x, y, z])
+        with self._stage('cvtColor'):
+            crop_rgb = self._crop_to_rgb(img, x0, y0, x1, y1)
+        with self._stage('hands.process'):
+            results = self.hands.process(crop_rgb)
+        if not results.multi_hand_landmarks:
+            return False
         
-        return landmarks_list
+        crop_width, crop_height = x1 - x0, y1 - y0
+        for hand in results.multi_hand_landmarks:
+            for landmark in hand.landmark:
+                landmark.x = (x0 + landmark.x * crop_width) / width
+                landmark.y = (y0 + landmark.y * crop_height) / height
+                landmark.z = landmark.z * crop_width / width
+        self.results = results
+        return True
     
-    def get_landmark_array(self, img, hand_number=0):
+    def _bounding_box(self, img):
+        """Pixel bounding box around all detected hands, or None."""
+        if not self.extract_landmarks(img):
+            return None
+        points = self.landmark_buffer[:self.num_hands, :, :2].reshape(-1, 2)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0)
+        return x0, y0, x1, y1
+    
+    def extract_landmarks(self, img):
+        """
+        Writes the landmarks of every detected hand into self.landmark_buffer.
+        Returns the number of hands written.
+        """
+        hands = self.results.multi_hand_landmarks if self.results else None
+        if not hands:
+            self.num_hands = 0
+            return 0
+        
+        height, width = img.shape[:2]
+        count = min(len(hands), self.max_hands)
+        buffer = self.landmark_buffer
+        handedness = self.results.multi_handedness or []
+        for h in range(count):
+            out = buffer[h]
+            for i, landmark in enumerate(hands[h].landmark):
+                out[i] = (landmark.x, landmark.y, landmark.z)
+            self.left_hand[h] = h < len(handedness) and handedness[h].classification[0].label == 'Left'
+        buffer[:count, :, 0] *= width
+        buffer[:count, :, 1] *= height
+        
+        self.num_hands = count
+        return count
+    
+    def find_positions(self, img, hand_number=0):
+        """
+        Returns a list of [id, x, y, z] for each landmark of the specified hand.
+        """
+        if self.extract_landmarks(img) <= hand_number:
+            return []
+        return [[id, *map(float, coords)] for id, coords in enumerate(self.landmark_buffer[hand_number])]
+    
+    def get_landmark_array(self, img, hand_number=0, copy=True):
         """
         Returns landmarks as a flat numpy array of shape (63,) for 21 landmarks.
+        With copy=False the result is a view into the reused landmark buffer
+        and is overwritten by the next frame.
         """
-        positions = self.find_positions(img, hand_number)
-        if not positions:
+        if self.extract_landmarks(img) <= hand_number:
             return None
-            
-        landmarks_array = np.array(positions)[:, 1:]  # Extract x, y, z
-        return landmarks_array.flatten()  # Shape: (63,)
+        
+        landmarks = self.landmark_buffer[hand_number].reshape(-1)  # Shape: (63,)
+        return landmarks.copy() if copy else landmarks
+    
+    def get_landmark_batch(self, img, copy=False):
+        """
+        Returns landmarks for all detected hands as an array of shape (n_hands, 63),
+        or None when no hand is found. A view into the landmark buffer unless copy=True.
+        """
+        count = self.extract_landmarks(img)
+        if not count:
+            return None
+        
+        batch = self.landmark_buffer[:count].reshape(count, -1)
+        return batch.copy() if copy else batch
+    
+    def reset(self):
+        """Forget tracking state, e.g. before processing an unrelated video."""
+        self.hands.reset()
+        self.results = None
+        self.reference_frame = None
+        self.hand_box = None
+        self.skipped_in_row = 0
+        self.num_hands = 0
     
     def release(self):
         """Placeholder for releasing resources (if needed)."""
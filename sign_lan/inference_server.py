@@ -0,0 +1,339 @@
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from config import (INFERENCE_BACKEND, INPUT_SHAPE, SIGNS, CAMERA_WIDTH, CONFIDENCE_THRESHOLD, SERVER_HOST, SERVER_PORT,
+                    SERVER_MAX_BATCH, SERVER_MAX_WAIT_MS, MAX_HANDS, CAMERA_SOURCE)
+from features import load_feature_pipeline
+from predictor import create_engine
+from temporal_decoder import create_decoder
+from word_decoder import create_word_decoder, SPACE_SIGN
+
+
+class MicroBatcher:
+    """
+    Gathers feature vectors submitted from many threads and classifies them
+    together. A batch is sent to the engine when it holds max_batch_size vectors
+    or when the oldest request has waited max_wait_ms, whichever comes first.
+    """
+    def __init__(self, engine, max_batch_size=SERVER_MAX_BATCH, max_wait_ms=SERVER_MAX_WAIT_MS):
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.input_size = engine.input_size
+        self.batch = np.empty((max_batch_size, self.input_size), dtype=np.float32)
+        self.latencies = deque(maxlen=10000)  # seconds from submit to result
+        self.batch_count = 0
+        self.vector_count = 0
+        self.running = True
+        self.lock = threading.Lock()  # no request is queued once close() has started
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, features):
+        """
+        Queue a (n, input_size) array of feature vectors (n <= max_batch_size).
+        Returns a Future resolving to the (n, classes) probabilities.
+        """
+        features = np.asarray(features, dtype=np.float32).reshape(-1, self.input_size)
+        if len(features) > self.max_batch_size:
+            raise ValueError(f"At most {self.max_batch_size} vectors per request")
+        future = Future()
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("The batcher is closed")
+            self.requests.put((time.perf_counter(), features, future))
+        return future
+
+    def _run(self):
+        carry = None  # request that did not fit in the previous batch
+        while self.running:
+            if carry is None:
+                try:
+                    carry = self.requests.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+            pending = [carry]
+            size = len(carry[1])
+            carry = None
+            deadline = pending[0][0] + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if size + len(item[1]) > self.max_batch_size:
+                    carry = item
+                    break
+                pending.append(item)
+                size += len(item[1])
+
+            self._predict(pending, size)
+        if carry is not None:
+            self._reject(carry)
+
+    @staticmethod
+    def _reject(request):
+        request[2].set_exception(RuntimeError("The batcher was closed before the request was classified"))
+
+    def _predict(self, pending, size):
+        offset = 0
+        for _, features, _ in pending:
+            self.batch[offset:offset + len(features)] = features
+            offset += len(features)
+        try:
+            probabilities = self.engine.predict(self.batch[:size])
+        except Exception as e:
+            for _, _, future in pending:
+                future.set_exception(e)
+            return
+
+        now = time.perf_counter()
+        offset = 0
+        for submitted, features, future in pending:
+            future.set_result(probabilities[offset:offset + len(features)])
+            offset += len(features)
+            self.latencies.append(now - submitted)
+        self.batch_count += 1
+        self.vector_count += size
+
+    def stats(self):
+        """Batch fill rate and p50/p99 request latency in milliseconds."""
+        latencies = np.array(self.latencies) * 1000.0
+        return {
+            'batches': self.batch_count,
+            'vectors': self.vector_count,
+            'fill_rate': self.vector_count / (self.batch_count * self.max_batch_size) if self.batch_count else 0.0,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+        }
+
+    def close(self):
+        """Stop batching; requests still queued fail with RuntimeError instead of waiting forever."""
+        with self.lock:
+            self.running = False
+        self.thread.join(timeout=1.0)
+        while True:
+            try:
+                self._reject(self.requests.get_nowait())
+            except queue.Empty:
+                return
+
+
+class InferenceService:
+    """
+    Classifies landmarks for many sources (camera streams or hands) through one
+    MicroBatcher, and keeps a temporal decoder, word decoder and current text
+    per source.
+    Landmarks are turned into features with the pipeline saved with the model.
+    """
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.features = load_feature_pipeline(batcher.engine.model_path)
+        self.class_names = getattr(batcher.engine, 'class_names', SIGNS)  # class id -> sign name
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def predict(self, source, landmarks, timestamp=None, frame_width=CAMERA_WIDTH, left_hand=None):
+        """
+        landmarks is a list of 63-value vectors, one per detected hand (may be empty),
+        from frames frame_width pixels wide; left_hand optionally flags each hand's handedness.
+        The first hand drives the source's decoded text.
+        """
+        results = []
+        probabilities = None
+        if len(landmarks):
+            features = self.features.transform(landmarks, frame_width, left_hand)
+            probabilities = self.batcher.submit(features).result()
+            for row in probabilities:
+                predicted_class = int(np.argmax(row))
+                confidence = float(row[predicted_class])
+                results.append({
+                    'class': predicted_class,
+                    'sign': self.class_names[predicted_class] if confidence > CONFIDENCE_THRESHOLD else None,
+                    'confidence': confidence,
+                })
+
+        with self.lock:
+            state = self.sources.get(source)
+            if state is None:
+                state = self.sources[source] = {'decoder': create_decoder(), 'words': create_word_decoder(),
+                                                'text': []}
+            decoder, words = state['decoder'], state['words']
+            committed_ids = decoder.update(probabilities[0] if probabilities is not None else None, timestamp)
+            committed = [self.class_names[c] for c in committed_ids]
+            for class_id, letter in zip(committed_ids, committed):
+                if words is None:
+                    state['text'].append(letter)
+                elif letter == SPACE_SIGN:
+                    state['text'].append(words.finish() + ' ')
+                elif words.is_letter(class_id):
+                    words.add(class_id, decoder.distribution())
+                else:  # a whole-word sign from the nearest-neighbour index
+                    pending = words.finish()
+                    state['text'].append((pending + ' ' if pending else '') + letter + ' ')
+            text = ''.join(state['text']) + (words.hypothesis() if words is not None else '')
+            suggestions = words.suggestions() if words is not None else []
+        return {'source': source, 'hands': results, 'committed': committed, 'text': text,
+                'suggestions': suggestions}
+
+    def reset(self, source):
+        with self.lock:
+            self.sources.pop(source, None)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /predict  {"source": "cam1", "landmarks": [[63 floats], ...], "timestamp": ms,
+                    "frame_width": pixels, "left_hand": [bool, ...]}  (the last three optional)
+    POST /reset    {"source": "cam1"}
+    GET  /stats
+    """
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send_json(200, self.service.batcher.stats())
+        else:
+            self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            source = str(request['source'])
+            if self.path == '/predict':
+                landmarks = np.asarray(request.get('landmarks', []), dtype=np.float32).reshape(-1, INPUT_SHAPE)
+                self._send_json(200, self.service.predict(source, landmarks, request.get('timestamp'),
+                                                          request.get('frame_width') or CAMERA_WIDTH,
+                                                          request.get('left_hand')))
+            elif self.path == '/reset':
+                self.service.reset(source)
+                self._send_json(200, {'source': source})
+            else:
+                self._send_json(404, {'error': 'not found'})
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {'error': str(e)})
+        except Exception as e:  # e.g. the engine failing on the batch, raised through the request's future
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+
+    def log_message(self, format, *args):
+        pass  # keep the console quiet at camera frame rates
+
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, backend=INFERENCE_BACKEND,
+          max_batch_size=SERVER_MAX_BATCH, max_wait_ms=SERVER_MAX_WAIT_MS):
+    """Run the HTTP inference service until interrupted."""
+    batcher = MicroBatcher(create_engine(backend), max_batch_size, max_wait_ms)
+    RequestHandler.service = InferenceService(batcher)
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    print(f"Inference server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        print(f"Final stats: {batcher.stats()}")
+
+
+class InferenceClient:
+    """Minimal client for the HTTP API."""
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT):
+        self.url = f"http://{host}:{port}"
+
+    def _post(self, path, payload):
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def predict(self, source, landmarks, timestamp=None, frame_width=None, left_hand=None):
+        landmarks = [] if landmarks is None else np.asarray(landmarks).reshape(-1, INPUT_SHAPE).tolist()
+        if left_hand is not None:
+            left_hand = [bool(flag) for flag in left_hand]
+        return self._post('/predict', {'source': source, 'landmarks': landmarks, 'timestamp': timestamp,
+                                       'frame_width': frame_width, 'left_hand': left_hand})
+
+    def reset(self, source):
+        return self._post('/reset', {'source': source})
+
+    def stats(self):
+        with urllib.request.urlopen(self.url + '/stats') as response:
+            return json.loads(response.read())
+
+
+def stream_camera(source, camera_source=CAMERA_SOURCE, host=SERVER_HOST, port=SERVER_PORT, max_hands=MAX_HANDS):
+    """Detect hands on one camera (or video file) and send every frame's landmarks to the server."""
+    from capture import Camera
+    from hand_detector import HandDetector
+
+    detector = HandDetector(max_hands=max_hands)
+    client = InferenceClient(host, port)
+    camera = Camera(camera_source)
+    if not camera.is_opened():
+        print(f"Error: Could not open camera {camera_source}.")
+        return
+    try:
+        while True:
+            ret, frame = camera.read()
+            if not ret:
+                break
+            frame = camera.flip(frame)
+            detector.find_hands(frame, draw=False)
+            landmarks = detector.get_landmark_batch(frame)
+            result = client.predict(source, landmarks, time.monotonic() * 1000.0, frame.shape[1],
+                                    detector.left_hand[:detector.num_hands])
+            if result['committed']:
+                print(f"[{source}] {result['text']}")
+    finally:
+        camera.release()
+        detector.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-batching sign classification server.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    server_parser = subparsers.add_parser('serve', help="Run the inference server")
+    server_parser.add_argument('--host', default=SERVER_HOST)
+    server_parser.add_argument('--port', type=int, default=SERVER_PORT)
+    server_parser.add_argument('--backend', default=INFERENCE_BACKEND)
+    server_parser.add_argument('--max-batch', type=int, default=SERVER_MAX_BATCH)
+    server_parser.add_argument('--max-wait-ms', type=float, default=SERVER_MAX_WAIT_MS)
+
+    camera_parser = subparsers.add_parser('camera', help="Stream one camera to a running server")
+    camera_parser.add_argument('source', help="Name of this stream")
+    camera_parser.add_argument('--camera', default=CAMERA_SOURCE, help="Camera index or video file")
+    camera_parser.add_argument('--host', default=SERVER_HOST)
+    camera_parser.add_argument('--port', type=int, default=SERVER_PORT)
+    camera_parser.add_argument('--max-hands', type=int, default=MAX_HANDS)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        serve(args.host, args.port, args.backend, args.max_batch, args.max_wait_ms)
+    else:
+        stream_camera(args.source, args.camera, args.host, args.port, args.max_hands)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from config import (INSTRUMENTATION, SHOW_OVERLAY, METRICS_PATH, METRICS_INTERVAL_S, METRICS_PORT,
+                    PROFILE_EVERY_N_FRAMES, PROFILE_PATH)
+
+# Bucket upper bounds in milliseconds, log-spaced from 10us to ~10s
+BUCKET_BOUNDS_MS = np.geomspace(0.01, 10000, 61)
+
+
+class LatencyHistogram:
+    """Fixed-size latency histogram; recording never allocates."""
+    def __init__(self):
+        self.counts = np.zeros(len(BUCKET_BOUNDS_MS) + 1, dtype=np.int64)  # last bucket: overflow
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent_ms = 0.0  # moving average shown on the overlay
+
+    def record(self, ms):
+        self.counts[np.searchsorted(BUCKET_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.recent_ms = ms if self.count == 1 else 0.9 * self.recent_ms + 0.1 * ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (never above the max seen)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * self.count
+        bucket = int(np.searchsorted(np.cumsum(self.counts), rank))
+        return min(float(BUCKET_BOUNDS_MS[min(bucket, len(BUCKET_BOUNDS_MS) - 1)]), self.max_ms)
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ms,
+        }
+
+
+class Instrumentation:
+    """
+    Per-stage timing for the capture/detect/classify/display loops.
+
+    Wrap each stage in `with instrumentation.stage('name'):` and call
+    frame_done() once per frame; count('name') tallies events such as
+    skipped detections. When disabled every call is a no-op.
+    Optional extras: an FPS / per-stage overlay drawn on the frame, periodic
+    metrics snapshots written as JSON or Prometheus text (chosen by the file
+    extension) or served over HTTP, and cProfile sampling of every Nth frame.
+    """
+    def __init__(self, enabled=INSTRUMENTATION, overlay=SHOW_OVERLAY, metrics_path=METRICS_PATH,
+                 metrics_interval_s=METRICS_INTERVAL_S, metrics_port=METRICS_PORT,
+                 profile_every=PROFILE_EVERY_N_FRAMES, profile_path=PROFILE_PATH):
+        self.enabled = enabled
+        self.overlay = overlay and enabled
+        self.metrics_path = metrics_path
+        self.metrics_interval_s = metrics_interval_s
+        self.profile_every = profile_every if enabled else 0
+        self.profile_path = profile_path
+
+        self.stages = {}
+        self.counters = {}
+        self.frames = 0
+        self.fps = 0.0
+        self.last_frame_time = None
+        self.last_export = time.monotonic()
+        self.lock = threading.Lock()
+
+        self.profiler = cProfile.Profile() if self.profile_every else None
+        self.profiling = False
+        self.server = None
+        if enabled and metrics_port:
+            self.serve_metrics(metrics_port)
+
+    def stage(self, name):
+        """Context manager timing one stage."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000.0)
+
+    def record(self, name, ms):
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(name, LatencyHistogram())
+        histogram.record(ms)
+
+    def count(self, name, n=1):
+        """Add n to the named event counter."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def frame_done(self):
+        """Mark the end of a frame: updates FPS, profiling and metrics export."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame_time is not None:
+            interval_ms = (now - self.last_frame_time) * 1000.0
+            self.record('frame', interval_ms)
+            self.fps = 0.9 * self.fps + 100.0 / interval_ms if self.fps else 1000.0 / interval_ms
+        self.last_frame_time = now
+        self.frames += 1
+
+        if self.profiler is not None:
+            self._sample_profile()
+        if self.metrics_path and time.monotonic() - self.last_export >= self.metrics_interval_s:
+            self.export(self.metrics_path)
+
+    def _sample_profile(self):
+        # Profiles exactly one frame out of every profile_every
+        if self.profiling:
+            self.profiler.disable()
+            self.profiling = False
+        if self.frames % self.profile_every == 0:
+            self.profiler.enable()
+            self.profiling = True
+
+    def draw_overlay(self, frame):
+        """Draw FPS and per-stage moving-average milliseconds in the top-right corner."""
+        if not self.overlay:
+            return
+        import cv2
+
+        x = max(frame.shape[1] - 260, 0)
+        lines = [f"FPS: {self.fps:5.1f}"] + [
+            f"{name}: {histogram.recent_ms:6.2f} ms"
+            for name, histogram in self.stages.items() if name != 'frame'
+        ]
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (x, 25 + 20 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+
+    def snapshot(self):
+        with self.lock:
+            stages = {name: histogram.summary() for name, histogram in self.stages.items()}
+            counters = dict(self.counters)
+        return {'timestamp': time.time(), 'frames': self.frames, 'fps': self.fps, 'stages': stages,
+                'counters': counters}
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            '# TYPE sign_lan_fps gauge',
+            f'sign_lan_fps {self.fps:.3f}',
+            '# TYPE sign_lan_stage_latency_ms histogram',
+        ]
+        with self.lock:
+            stages = list(self.stages.items())
+            counters = list(self.counters.items())
+        for name, histogram in stages:
+            cumulative = np.cumsum(histogram.counts)
+            for bound, count in zip(BUCKET_BOUNDS_MS, cumulative):
+                lines.append(f'sign_lan_stage_latency_ms_bucket{{stage="{name}",le="{bound:.4g}"}} {count}')
+            lines.append(f'sign_lan_stage_latency_ms_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'sign_lan_stage_latency_ms_sum{{stage="{name}"}} {histogram.total_ms:.3f}')
+            lines.append(f'sign_lan_stage_latency_ms_count{{stage="{name}"}} {histogram.count}')
+        if counters:
+            lines.append('# TYPE sign_lan_events_total counter')
+            for name, count in counters:
+                lines.append(f'sign_lan_events_total{{event="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """Write a snapshot to path, as Prometheus text for .prom/.txt files and JSON otherwise."""
+        self.last_export = time.monotonic()
+        if path.endswith(('.prom', '.txt')):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)  # readers never see a half-written file
+
+    def serve_metrics(self, port, host='127.0.0.1'):
+        """Serve /metrics (Prometheus) and /metrics.json from a background thread."""
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = instrumentation.to_prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(instrumentation.snapshot()), 'application/json'
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True).start()
+
+    def close(self):
+        """Write final metrics and the profile, and stop the metrics server."""
+        if not self.enabled:
+            return
+        if self.metrics_path:
+            self.export(self.metrics_path)
+        if self.profiler is not None:
+            if self.profiling:
+                self.profiler.disable()
+                self.profiling = False
+            self.profiler.dump_stats(self.profile_path)
+            print(f"Profile of sampled frames saved to {self.profile_path} (view with python -m pstats)")
+        if self.server is not None:
+            self.server.shutdown()
+            self.server = None
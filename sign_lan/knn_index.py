@@ -0,0 +1,418 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from config import (SIGNS, MODEL_PATH, KNN_INDEX_PATH, KNN_METHOD, KNN_NEIGHBOURS, KNN_EMBEDDING, KNN_LISTS,
+                    KNN_PROBES, KNN_PQ_SUBSPACES, CAMERA_SOURCE, COLLECT_INTERVAL_MS, COLLECT_MIN_DELTA,
+                    ensure_directories)
+from features import FeaturePipeline, RAW_VERSION, load_feature_pipeline
+from model_metadata import load_model_metadata, save_model_metadata
+
+KNN_METHODS = ['exact', 'ivf', 'pq']
+KNN_EMBEDDINGS = ['features', 'model']
+PQ_CENTROIDS = 256       # one byte per subspace code
+RERANK_FACTOR = 8        # PQ candidates re-ranked with exact distances, per neighbour requested
+REBUILD_FRACTION = 0.25  # re-train the quantizer once unindexed vectors exceed this share of the indexed ones
+INDEX_ARRAYS = ['vectors', 'labels', 'centroids', 'list_offsets', 'codebooks', 'codes']
+
+
+def squared_distances(queries, vectors, vector_norms=None):
+    """(len(queries), len(vectors)) squared Euclidean distances, through one matrix product."""
+    if vector_norms is None:
+        vector_norms = np.einsum('ij,ij->i', vectors, vectors)
+    distances = queries @ vectors.T
+    distances *= -2
+    distances += vector_norms
+    distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+    return np.maximum(distances, 0, out=distances)
+
+
+def nearest(vectors, centroids, chunk_size=4096):
+    """Index of the nearest centroid for every vector, computed in chunks to bound memory."""
+    centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+    return np.concatenate([
+        np.argmin(squared_distances(vectors[i:i + chunk_size], centroids, centroid_norms), axis=1)
+        for i in range(0, len(vectors), chunk_size)
+    ]) if len(vectors) else np.empty(0, dtype=np.int64)
+
+
+def kmeans(vectors, k, iterations=20, seed=0):
+    """Lloyd's k-means from randomly chosen vectors. Returns (centroids, assignment)."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = nearest(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(vectors[order], starts, axis=0) / counts[filled, None]
+        if not filled.all():  # restart empty clusters from random vectors
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids, nearest(vectors, centroids)
+
+
+class KNNIndex:
+    """
+    Labelled embedding vectors with k-nearest-neighbour search in NumPy.
+
+    'exact' compares a query with every vector. 'ivf' clusters the vectors with
+    k-means, stores each cluster contiguously and only searches the probes
+    clusters closest to the query. 'pq' splits vectors into subspaces, encodes
+    each with a one-byte code from a per-subspace codebook, ranks all vectors by
+    their approximate distance from per-query lookup tables and re-ranks the
+    best candidates exactly. Vectors enrolled after the quantizer was trained
+    are searched exhaustively until the next build().
+
+    Embeddings are feature vectors from the FeaturePipeline saved with the
+    index, or, with embedding='model', the trained network's last hidden layer.
+    Classes start as SIGNS, in order, so class ids agree with the trained
+    model's; enrolled signs with new names are appended.
+
+    Arrays are saved as .npy files in one directory and opened memory-mapped,
+    so a saved index loads instantly whatever its size.
+    """
+    def __init__(self, dims, features, classes=None, method=KNN_METHOD, embedding=KNN_EMBEDDING,
+                 model_path=None, lists=KNN_LISTS, probes=KNN_PROBES, subspaces=KNN_PQ_SUBSPACES):
+        if method not in KNN_METHODS:
+            raise ValueError(f"Unknown k-NN method '{method}'. Choose from {KNN_METHODS}")
+        self.dims = dims
+        self.features = features  # FeaturePipeline spec the vectors were built with
+        self.classes = list(classes) if classes is not None else list(SIGNS.values())
+        self.method = method
+        self.embedding = embedding
+        self.model_path = model_path  # network providing 'model' embeddings
+        self.lists = lists
+        self.probes = probes
+        self.subspaces = subspaces
+        self.vectors = np.empty((0, dims), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.indexed = 0  # vectors[:indexed] are covered by the quantizer
+        self.centroids = self.list_offsets = None  # ivf: cluster centres and each cluster's slice of vectors
+        self.codebooks = self.codes = None         # pq: (subspaces, centroids, sub-dims) and (subspaces, indexed)
+        self._norms = None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def norms(self):
+        """Squared vector norms for exact distances, computed once per change."""
+        if self._norms is None or len(self._norms) != len(self.vectors):
+            self._norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+        return self._norms
+
+    def class_counts(self):
+        counts = np.bincount(self.labels, minlength=len(self.classes))
+        return {name: int(count) for name, count in zip(self.classes, counts)}
+
+    def add(self, vectors, labels):
+        """Append vectors with their class ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dims)
+        self.vectors = np.concatenate([self.vectors, vectors])  # also moves memory-mapped arrays into memory
+        self.labels = np.concatenate([self.labels, np.asarray(labels, dtype=np.int32)])
+
+    def enroll(self, name, vectors):
+        """
+        Add samples of a sign, or of a new signer for an existing one. Unknown
+        names become new classes. The quantizer is re-trained once enough
+        vectors are outside it. Returns the class id.
+        """
+        if name not in self.classes:
+            self.classes.append(name)
+        class_id = self.classes.index(name)
+        self.add(vectors, np.full(len(vectors), class_id))
+        if self.method != 'exact' and len(self) - self.indexed > REBUILD_FRACTION * self.indexed:
+            self.build()
+        return class_id
+
+    def build(self):
+        """Train the IVF clusters or PQ codebooks on all vectors."""
+        self.indexed = len(self)
+        self.centroids = self.list_offsets = self.codebooks = self.codes = None
+        if self.method == 'exact' or not len(self):
+            return
+        if self.method == 'ivf':
+            lists = self.lists or max(1, int(np.sqrt(len(self))))
+            self.centroids, assignment = kmeans(self.vectors, lists)
+            order = np.argsort(assignment, kind='stable')
+            self.vectors, self.labels = self.vectors[order], self.labels[order]
+            counts = np.bincount(assignment, minlength=len(self.centroids))
+            self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        else:
+            subvectors = self._split(self.vectors)
+            centroids = min(PQ_CENTROIDS, len(self))
+            self.codebooks = np.stack([kmeans(part, centroids, iterations=15)[0] for part in subvectors])
+            # One contiguous row of codes per subspace keeps the table lookups in search() sequential
+            self.codes = np.stack([nearest(part, codebook).astype(np.uint8)
+                                   for part, codebook in zip(subvectors, self.codebooks)])
+        self._norms = None
+
+    def _split(self, vectors):
+        """Vectors as (subspaces, n, sub-dims), zero-padded so the dimensions divide evenly."""
+        sub_dims = -(-self.dims // self.subspaces)
+        padded = np.zeros((len(vectors), sub_dims * self.subspaces), dtype=np.float32)
+        padded[:, :self.dims] = vectors
+        return padded.reshape(len(vectors), self.subspaces, sub_dims).transpose(1, 0, 2)
+
+    def _candidates(self, query, k):
+        """Vector indices worth comparing exactly with one query."""
+        tail = np.arange(self.indexed, len(self))
+        if self.method == 'ivf' and self.centroids is not None:
+            closest = np.argsort(squared_distances(query[None], self.centroids)[0])[:self.probes]
+            ranges = [np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in closest]
+            return np.concatenate(ranges + [tail])
+        if self.method == 'pq' and self.codes is not None:
+            parts = self._split(query[None])[:, 0]  # (subspaces, sub-dims)
+            tables = ((self.codebooks - parts[:, None]) ** 2).sum(axis=2)  # (subspaces, centroids)
+            approximate = np.zeros(self.codes.shape[1], dtype=np.float32)
+            for table, codes in zip(tables, self.codes):
+                approximate += table.take(codes)
+            shortlist = min(len(approximate), k * RERANK_FACTOR)
+            best = np.argpartition(approximate, shortlist - 1)[:shortlist]
+            return np.concatenate([best, tail])
+        return None  # everything
+
+    def search(self, queries, k=KNN_NEIGHBOURS):
+        """(squared distances, vector indices) of the k nearest vectors to each query, nearest first."""
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dims)
+        k = min(k, len(self))
+        distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+        indices = np.zeros((len(queries), k), dtype=np.int64)
+        if not k:
+            return distances, indices
+        if self.method == 'exact' or self.indexed == 0:
+            all_distances = squared_distances(queries, self.vectors, self.norms)
+            nearest_k = np.argpartition(all_distances, k - 1, axis=1)[:, :k]
+            return self._sorted(np.take_along_axis(all_distances, nearest_k, axis=1), nearest_k)
+
+        for row, query in enumerate(queries):
+            candidates = self._candidates(query, k)
+            found = squared_distances(query[None], self.vectors[candidates], self.norms[candidates])[0]
+            count = min(k, len(candidates))
+            best = np.argpartition(found, count - 1)[:count]
+            distances[row, :count], indices[row, :count] = found[best], candidates[best]
+        return self._sorted(distances, indices)
+
+    @staticmethod
+    def _sorted(distances, indices):
+        order = np.argsort(distances, axis=1)
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def predict_proba(self, queries, k=KNN_NEIGHBOURS):
+        """
+        (n, classes) probabilities: the votes of the k nearest vectors, each
+        weighted by its inverse distance to the query.
+        """
+        distances, indices = self.search(queries, k)
+        weights = 1.0 / (np.sqrt(distances) + 1e-3)
+        weights[~np.isfinite(distances)] = 0.0
+        probabilities = np.zeros((len(distances), len(self.classes)), dtype=np.float32)
+        np.add.at(probabilities, (np.arange(len(distances))[:, None], self.labels[indices]), weights)
+        probabilities /= np.maximum(probabilities.sum(axis=1, keepdims=True), 1e-12)
+        return probabilities
+
+    def save(self, path=KNN_INDEX_PATH):
+        """Write the arrays into the path directory and the settings into its metadata file."""
+        ensure_directories(path)
+        for name in INDEX_ARRAYS:
+            array = getattr(self, name)
+            file_path = os.path.join(path, f"{name}.npy")
+            if array is None:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                continue
+            if isinstance(array, np.memmap):
+                # Still mapped from the file being replaced (load() then enroll() without a rebuild);
+                # Windows cannot replace a mapped file, so keep the array in memory from now on
+                array = np.array(array)
+                setattr(self, name, array)
+            tmp_path = file_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.save(f, array)
+            os.replace(tmp_path, file_path)
+        save_model_metadata(path, features=self.features, index={
+            'dims': self.dims, 'classes': self.classes, 'method': self.method, 'embedding': self.embedding,
+            'model_path': self.model_path, 'lists': self.lists, 'probes': self.probes,
+            'subspaces': self.subspaces, 'indexed': self.indexed, 'vectors': len(self),
+        })
+
+    @classmethod
+    def load(cls, path=KNN_INDEX_PATH):
+        """Open a saved index with its arrays memory-mapped."""
+        metadata = load_model_metadata(path)
+        if 'index' not in metadata:
+            raise FileNotFoundError(f"No k-NN index at {path}")
+        settings = metadata['index']
+        index = cls(settings['dims'], metadata['features'], settings['classes'], settings['method'],
+                    settings['embedding'], settings['model_path'], settings['lists'], settings['probes'],
+                    settings['subspaces'])
+        for name in INDEX_ARRAYS:
+            file_path = os.path.join(path, f"{name}.npy")
+            if os.path.exists(file_path):
+                setattr(index, name, np.load(file_path, mmap_mode='r'))
+        index.indexed = settings['indexed']
+        return index
+
+    @staticmethod
+    def exists(path=KNN_INDEX_PATH):
+        return 'index' in load_model_metadata(path)
+
+
+def embedding_source(embedding=KNN_EMBEDDING, model_path=MODEL_PATH):
+    """(FeaturePipeline, embed function or None, embedding dims) for an embedding type."""
+    if embedding == 'model':
+        from predictor import NumpyEngine
+
+        pipeline = load_feature_pipeline(model_path)
+        if pipeline.version == RAW_VERSION:
+            raise ValueError(f"{model_path} was trained on raw landmarks; retrain it before using its embeddings")
+        engine = NumpyEngine(model_path)
+        return pipeline, engine.embed, engine.layers[-1][0].shape[0]
+    if embedding != 'features':
+        raise ValueError(f"Unknown embedding '{embedding}'. Choose from {KNN_EMBEDDINGS}")
+    pipeline = FeaturePipeline()
+    return pipeline, None, pipeline.output_size
+
+
+def open_index(path=KNN_INDEX_PATH, method=KNN_METHOD, embedding=KNN_EMBEDDING, model_path=MODEL_PATH):
+    """The index saved at path, or a new empty one."""
+    if KNNIndex.exists(path):
+        return KNNIndex.load(path)
+    pipeline, _, dims = embedding_source(embedding, model_path)
+    return KNNIndex(dims, pipeline.spec(), method=method, embedding=embedding,
+                    model_path=model_path if embedding == 'model' else None)
+
+
+def build_from_dataset(path=KNN_INDEX_PATH, method=KNN_METHOD, embedding=KNN_EMBEDDING, model_path=MODEL_PATH,
+                       max_per_class=None, chunk_size=4096):
+    """
+    Build an index from the collected dataset, optionally keeping a random
+    max_per_class samples of every class. Returns the index, or None without a dataset.
+    """
+    from model_trainer import open_dataset, to_points
+
+    read_rows, labels, pixel_landmarks, mirror_left_hands = open_dataset()
+    if read_rows is None:
+        return None
+    pipeline, embed, dims = embedding_source(embedding, model_path)
+    if embedding == 'features':
+        pipeline.mirror_left_hands = mirror_left_hands  # as ModelTrainer does for the data it was given
+
+    indices = np.arange(len(labels))
+    if max_per_class:
+        rng = np.random.default_rng(0)
+        indices = np.sort(np.concatenate([
+            rng.permutation(np.flatnonzero(labels == class_id))[:max_per_class] for class_id in np.unique(labels)
+        ]))
+
+    index = KNNIndex(dims, pipeline.spec(), method=method, embedding=embedding,
+                     model_path=model_path if embedding == 'model' else None)
+    for start in range(0, len(indices), chunk_size):
+        landmarks, y = read_rows(indices[start:start + chunk_size])
+        vectors = pipeline.expand(to_points(pipeline, landmarks, pixel_landmarks))
+        index.add(embed(vectors) if embed else vectors, y)
+    index.build()
+    index.save(path)
+    return index
+
+
+def capture_vectors(index, count, source=CAMERA_SOURCE, mirror=True, min_interval_ms=COLLECT_INTERVAL_MS,
+                    min_delta=COLLECT_MIN_DELTA):
+    """
+    Embeddings of count hand poses from a camera or video, skipping frames
+    closer than min_interval_ms and poses closer than min_delta to the last one
+    kept, as DataCollector does. Press 'q' to stop early.
+    """
+    import cv2
+    from capture import Camera
+    from hand_detector import HandDetector
+
+    pipeline = FeaturePipeline.from_spec(index.features)
+    embed = embedding_source('model', index.model_path)[1] if index.embedding == 'model' else None
+    detector = HandDetector(max_hands=1)
+    camera = Camera(source)
+    vectors, last_pose, last_time = [], None, 0.0
+    try:
+        while len(vectors) < count:
+            ret, frame = camera.read()
+            if not ret:
+                break
+            if mirror:
+                frame = camera.flip(frame)
+            frame = detector.find_hands(frame)
+            landmarks = detector.get_landmark_array(frame, copy=False)
+            now = time.monotonic() * 1000.0
+            if landmarks is not None and now - last_time >= min_interval_ms:
+                left_hand = detector.left_hand[:1]
+                pose = pipeline.normalize(landmarks, frame.shape[1], left_hand)[0]
+                if last_pose is None or np.linalg.norm(pose - last_pose, axis=-1).mean() >= min_delta:
+                    vectors.append(pipeline.expand(pose[None])[0])
+                    last_pose, last_time = pose, now
+            cv2.putText(frame, f"Samples: {len(vectors)}/{count}", (10, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.imshow('Enroll Sign', frame)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+    finally:
+        camera.release()
+        detector.release()
+        cv2.destroyAllWindows()
+
+    vectors = np.array(vectors, dtype=np.float32).reshape(-1, pipeline.output_size)
+    return embed(vectors) if embed is not None and len(vectors) else vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the nearest-neighbour sign index and enroll signs into it.")
+    parser.add_argument('--index', default=KNN_INDEX_PATH)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Build the index from the collected dataset (replaces enrolled samples)")
+    build.add_argument('--method', choices=KNN_METHODS, default=KNN_METHOD)
+    build.add_argument('--embedding', choices=KNN_EMBEDDINGS, default=KNN_EMBEDDING)
+    build.add_argument('--max-per-class', type=int, default=None)
+
+    enroll = commands.add_parser('enroll', help="Record a sign (new or existing) and add it to the index")
+    enroll.add_argument('name', help="Sign name, e.g. a letter or a whole word")
+    enroll.add_argument('-n', '--samples', type=int, default=30)
+    enroll.add_argument('--source', default=CAMERA_SOURCE, help="Camera index or video file")
+    enroll.add_argument('--no-mirror', action='store_true', help="Do not flip frames horizontally")
+
+    commands.add_parser('info', help="Show the classes and sample counts in the index")
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = build_from_dataset(args.index, args.method, args.embedding, max_per_class=args.max_per_class)
+        if index is None:
+            print("Dataset not found. Please collect data first.")
+            return
+        print(f"Indexed {len(index)} samples ({args.method}) in {time.perf_counter() - start:.1f}s")
+    elif args.command == 'enroll':
+        index = open_index(args.index)
+        vectors = capture_vectors(index, args.samples, args.source, not args.no_mirror)
+        if not len(vectors):
+            print("No hand samples captured; nothing enrolled.")
+            return
+        start = time.perf_counter()
+        class_id = index.enroll(args.name, vectors)
+        index.save(args.index)
+        print(f"Enrolled {len(vectors)} samples of '{args.name}' (class {class_id}) "
+              f"in {time.perf_counter() - start:.2f}s")
+    else:
+        if not KNNIndex.exists(args.index):
+            print(f"No index at {args.index}.")
+            return
+        index = KNNIndex.load(args.index)
+        print(f"{len(index)} samples, {index.method} search over {index.embedding} embeddings ({index.dims} dims)")
+        for name, count in index.class_counts().items():
+            if count:
+                print(f"  {name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
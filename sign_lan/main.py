@@ -1,11 +1,6 @@
 import os
 import sys
 from pathlib import Path
-import cv2
-from hand_detector import HandDetector
-from data_collector import DataCollector
-from model_trainer import ModelTrainer
-from predictor import SignPredictor
 from config import *
 
 # Add project directory to Python path
@@ -13,8 +8,21 @@ project_dir = Path(__file__).resolve().parent
 if str(project_dir) not in sys.path:
     sys.path.append(str(project_dir))
 
+# Heavy modules (MediaPipe, TensorFlow) are imported only when an action needs them,
+# so the menu shows up immediately.
+
+def dataset_exists():
+    """True if collected data is available for training."""
+    if os.path.exists(FEATURES_PATH):
+        return True
+    from dataset_store import DatasetStore
+    return DatasetStore.exists(STORE_DIR)
+
 def initialize_collector():
     """Initialize HandDetector and DataCollector."""
+    from hand_detector import HandDetector
+    from data_collector import DataCollector
+    
     detector = HandDetector(
         static_mode=False,
         max_hands=1,
@@ -43,7 +51,11 @@ def main():
             print("\nStarting data collection...")
             print("Available signs:", list(SIGNS.values()))
             
-            for sign_name, class_id in SIGNS.items():
+            for class_id, sign_name in SIGNS.items():
+                if collector.is_complete(class_id):
+                    print(f"\nSign '{sign_name}' already has {SAMPLES_PER_SIGN} samples, skipping")
+                    continue
+                
                 print(f"\nCollecting data for sign '{sign_name}'")
                 print(f"Class ID: {class_id}")
                 print("Press 'c' to start collecting samples.")
@@ -62,26 +74,30 @@ def main():
             print("\nAll data collection completed and saved in the dataset folder!")
             
         elif choice == '2':
-            features_path = os.path.join(DATASET_DIR, 'features.npy')
-            labels_path = os.path.join(DATASET_DIR, 'labels.npy')
-            
-            if not os.path.exists(features_path) or not os.path.exists(labels_path):
+            if not dataset_exists():
                 print("Dataset not found. Please collect data first.")
                 continue
             
+            from model_trainer import ModelTrainer
+            
             trainer = ModelTrainer()
-            history = trainer.train()
+            incremental = (os.path.exists(MODEL_PATH) and
+                           input("Fine-tune the existing model on newly added data only? (y/N): ").strip().lower() == 'y')
+            history = trainer.train_incremental() if incremental else trainer.train()
             
             if history:
                 print("\nTraining completed successfully! Model saved in models folder.")
+                if EXPORT_AFTER_TRAINING:
+                    from export import export_models
+                    export_models(trainer.model)
                 
         elif choice == '3':
-            model_path = os.path.join(MODEL_DIR, 'sign_language_model.h5')
-            
-            if not os.path.exists(model_path):
+            if not os.path.exists(MODEL_PATH):
                 print("No trained model found. Please train the model first.")
                 continue
                 
+            from predictor import SignPredictor
+            
             predictor = SignPredictor()
             predictor.run_prediction()
             
@@ -0,0 +1,27 @@
+import json
+import os
+
+
+def metadata_path(model_path):
+    """Sidecar file shared by a model and its exported variants: models/name.meta.json."""
+    return os.path.splitext(model_path)[0] + '.meta.json'
+
+
+def load_model_metadata(model_path):
+    """The metadata saved with a model, or {} for models without any."""
+    try:
+        with open(metadata_path(model_path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_model_metadata(model_path, **fields):
+    """Merge fields into the model's metadata file (written atomically)."""
+    metadata = {**load_model_metadata(model_path), **fields}
+    path = metadata_path(model_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp_path, path)
+    return metadata
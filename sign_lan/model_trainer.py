@@ -1,54 +1,409 @@
+import glob
+import hashlib
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
 import numpy as np
 import os
-from config import FEATURES_PATH, LABELS_PATH, MODEL_PATH, INPUT_SHAPE, BATCH_SIZE, EPOCHS, VALIDATION_SPLIT, SIGNS
+from datetime import datetime
+from config import (FEATURES_PATH, LABELS_PATH, MODEL_PATH, BATCH_SIZE, EPOCHS, VALIDATION_SPLIT, SIGNS,
+                    STORE_DIR, READ_CHUNK_SIZE, SHUFFLE_BUFFER, AUGMENT_TRAINING, VALIDATION_CACHE, CHECKPOINT_DIR,
+                    EARLY_STOPPING_PATIENCE, REDUCE_LR_PATIENCE, INTRA_OP_THREADS, INTER_OP_THREADS, MIXED_PRECISION,
+                    INCREMENTAL_EPOCHS, INCREMENTAL_LEARNING_RATE, REPLAY_RATIO, ensure_directories)
+from dataset_store import DatasetStore
+from features import FeaturePipeline, LEGACY_FRAME_WIDTH
+from model_metadata import load_model_metadata, save_model_metadata
+
+DEFAULT_HYPERPARAMS = {
+    'units': (128, 64),
+    'dropout': 0.2,
+    'learning_rate': 0.001,
+    'batch_size': BATCH_SIZE,
+}
+
+def configure_runtime(intra_op_threads=INTRA_OP_THREADS, inter_op_threads=INTER_OP_THREADS,
+                      mixed_precision=MIXED_PRECISION):
+    """
+    Applies CPU thread settings and the precision policy.
+    Thread settings only take effect before TensorFlow runs its first op.
+    """
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError:
+        print("TensorFlow already initialized; keeping its current thread settings.")
+    # bfloat16 is the reduced-precision type that CPUs can run efficiently
+    tf.keras.mixed_precision.set_global_policy('mixed_bfloat16' if mixed_precision else 'float32')
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Reports training throughput in samples per second for every epoch."""
+    def __init__(self, num_samples):
+        super().__init__()
+        self.num_samples = num_samples
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start_time = time.perf_counter()
+        self.end_time = self.start_time
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.end_time = time.perf_counter()  # excludes the validation pass
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = self.end_time - self.start_time
+        samples_per_sec = self.num_samples / elapsed if elapsed > 0 else 0.0
+        if logs is not None:
+            logs['samples_per_sec'] = samples_per_sec
+        print(f"Epoch {epoch + 1}: {samples_per_sec:,.0f} samples/sec")
+
+def open_dataset():
+    """
+    Returns (read_rows, labels, pixel_landmarks, mirror_left_hands), with
+    read_rows and labels None if there is no dataset. read_rows(indices)
+    gathers (landmarks, labels) for the given sample indices, so landmarks are
+    only read from disk as batches need them. Prefers the sharded DatasetStore
+    and falls back to features.npy / labels.npy.
+    """
+    if DatasetStore.exists(STORE_DIR):
+        store = DatasetStore(STORE_DIR)
+        return (store.read, store.labels().astype(np.int32),
+                store.landmark_format == 'pixels', store.mirror_left_hands)
+    
+    if os.path.exists(FEATURES_PATH) and os.path.exists(LABELS_PATH):
+        X = np.load(FEATURES_PATH, mmap_mode='r')
+        y = np.load(LABELS_PATH)
+        if y.dtype.kind in 'US':
+            # Older collections stored the sign letters instead of class ids
+            class_ids = {name: class_id for class_id, name in SIGNS.items()}
+            y = np.array([class_ids[label] for label in y])
+        y = y.astype(np.int32)
+        # Pixel landmarks without recorded handedness
+        return lambda indices: (X[indices], y[indices]), y, True, False
+    return None, None, False, False
+
+def split_indices(num_samples):
+    """
+    (train, validation) sample indices. Each sample's side of the split depends
+    only on its index, so the split is identical when a run resumes from a
+    checkpoint, export.py evaluates on the same validation samples, and samples
+    appended later never move existing ones between the two sides.
+    """
+    indices = np.arange(num_samples, dtype=np.uint64)
+    # Fractional parts of i * golden ratio are spread evenly, so every stretch of
+    # samples (one sign, one session) contributes its share to validation
+    position = (indices * np.uint64(2654435761) % np.uint64(1 << 32)) / float(1 << 32)
+    validation = position < VALIDATION_SPLIT
+    indices = indices.astype(np.int64)
+    return indices[~validation], indices[validation]
+
+def dataset_coverage(num_samples):
+    """
+    Samples per data file among the first num_samples of the dataset, i.e. the
+    shards a model trained on them has seen: {file name: samples}.
+    """
+    if DatasetStore.exists(STORE_DIR):
+        store = DatasetStore(STORE_DIR)
+        shard_ids, counts = np.unique(store.index['shard'][:num_samples], return_counts=True)
+        return {store.shard_path(int(shard_id)).name: int(count) for shard_id, count in zip(shard_ids, counts)}
+    return {os.path.basename(FEATURES_PATH): int(num_samples)}
+
+def validation_cache_path(indices, spec, batch_size, path=VALIDATION_CACHE, remove_stale=True):
+    """
+    Cache file for one validation split: path with a hash of the sample indices,
+    the feature spec and the batch size, so appended data or a changed pipeline
+    never reuses a stale cache. With remove_stale, caches of other splits are deleted.
+    """
+    key = hashlib.sha1(np.ascontiguousarray(indices, dtype=np.int64).tobytes())
+    key.update(json.dumps([spec, batch_size], sort_keys=True).encode('utf-8'))
+    cache_path = f"{path}.{key.hexdigest()[:16]}"
+    for stale in glob.glob(glob.escape(path) + '.*') if remove_stale else []:
+        if not stale.startswith(cache_path):
+            os.remove(stale)
+    return cache_path
+
+def expand_output_layer(model, num_classes):
+    """
+    The model with its softmax layer widened to num_classes outputs. Weights of
+    the existing classes are copied over; new classes start from small random
+    weights and the mean existing bias, so they neither dominate nor vanish in
+    the first fine-tuning steps. The hidden layers are shared, not copied.
+    """
+    kernel, bias = model.layers[-1].get_weights()
+    if num_classes == len(bias):
+        return model
+    if num_classes < len(bias):
+        raise ValueError(f"Model has {len(bias)} classes but SIGNS only {num_classes}; classes cannot be removed")
+
+    output = Dense(num_classes, activation='softmax', dtype='float32',
+                   name=f"{model.layers[-1].name}_expanded_{num_classes}")
+    expanded = Sequential([tf.keras.Input(shape=model.input_shape[1:]), *model.layers[:-1], output])
+    new_kernel, new_bias = output.get_weights()
+    new_kernel[:, :len(bias)] = kernel
+    new_bias[:len(bias)] = bias
+    new_bias[len(bias):] = bias.mean()
+    output.set_weights([new_kernel, new_bias])
+    return expanded
+
+def to_points(pipeline, landmarks, pixel_landmarks):
+    """Normalized (n, 21, 3) points from stored landmarks (a writable copy)."""
+    if pixel_landmarks:
+        return pipeline.normalize(landmarks, LEGACY_FRAME_WIDTH)
+    return np.array(landmarks, dtype=np.float32).reshape(len(landmarks), -1, 3)
 
 class ModelTrainer:
-    def __init__(self):
+    def __init__(self, hyperparams=None, intra_op_threads=INTRA_OP_THREADS, inter_op_threads=INTER_OP_THREADS):
+        configure_runtime(intra_op_threads, inter_op_threads)
+        self.hyperparams = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+        self.features = FeaturePipeline()
+        self.pixel_landmarks = False  # set by open_dataset for datasets stored in pixel units
+        self.validation_cache = VALIDATION_CACHE
+        self.remove_stale_caches = True
         self.model = self.create_model()
 
     def create_model(self):
         """Creates and compiles the model."""
+        units1, units2 = self.hyperparams['units']
+        dropout = self.hyperparams['dropout']
         model = Sequential([
-            Dense(128, activation='relu', input_shape=(INPUT_SHAPE,)),
-            Dropout(0.2),
-            Dense(64, activation='relu'),
-            Dropout(0.2),
-            Dense(len(SIGNS), activation='softmax')
+            Dense(units1, activation='relu', input_shape=(self.features.output_size,)),
+            Dropout(dropout),
+            Dense(units2, activation='relu'),
+            Dropout(dropout),
+            Dense(len(SIGNS), activation='softmax', dtype='float32')  # keep softmax in float32 under mixed precision
         ])
-        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+        optimizer = tf.keras.optimizers.Adam(learning_rate=self.hyperparams['learning_rate'])
+        model.compile(optimizer=optimizer, loss='sparse_categorical_crossentropy', metrics=['accuracy'])
         return model
 
-    def train(self):
-        """Train the model using the saved dataset."""
-        if not os.path.exists(FEATURES_PATH) or not os.path.exists(LABELS_PATH):
+    def create_callbacks(self, num_train_samples, checkpoint_dir=CHECKPOINT_DIR):
+        """
+        Early stopping, learning-rate reduction on plateau and throughput reporting.
+        With a checkpoint_dir, state is backed up every epoch and an interrupted
+        run resumes from its last completed epoch.
+        """
+        callbacks = [
+            tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=EARLY_STOPPING_PATIENCE,
+                                             restore_best_weights=True),
+            tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=REDUCE_LR_PATIENCE,
+                                                 min_lr=1e-5),
+            ThroughputCallback(num_train_samples),
+        ]
+        if checkpoint_dir:
+            # Removed automatically once training finishes
+            callbacks.append(tf.keras.callbacks.BackupAndRestore(backup_dir=checkpoint_dir))
+        return callbacks
+
+    def open_dataset(self):
+        """
+        Returns (read_rows, labels), or (None, None) if there is no dataset (see open_dataset()).
+        Also records whether the landmarks still need normalizing and whether
+        left hands were mirrored, which the saved feature spec must match.
+        """
+        read_rows, labels, self.pixel_landmarks, self.features.mirror_left_hands = open_dataset()
+        return read_rows, labels
+
+    def make_dataset(self, read_rows, indices, training):
+        """
+        Builds a tf.data pipeline over the given sample indices.
+        Samples are read in sorted chunks so memory-mapped reads stay mostly
+        sequential; training data is shuffled at chunk and sample level, validation
+        data is cached after the first epoch. Each chunk goes through the same
+        FeaturePipeline the predictor uses (training chunks are augmented before
+        the features are expanded) in parallel map calls.
+        """
+        indices = np.sort(indices)
+        num_chunks = (len(indices) + READ_CHUNK_SIZE - 1) // READ_CHUNK_SIZE
+        pipeline = self.features
+        pixel_landmarks = self.pixel_landmarks
+        augment = training and AUGMENT_TRAINING
+        
+        def read_chunk(chunk_id):
+            chunk = indices[chunk_id * READ_CHUNK_SIZE:(chunk_id + 1) * READ_CHUNK_SIZE]
+            landmarks, labels = read_rows(chunk)
+            points = to_points(pipeline, landmarks, pixel_landmarks)
+            if augment:
+                points = self.augment(points, np.random.default_rng())
+            return pipeline.expand(points), np.asarray(labels, dtype=np.int32)
+        
+        def load(chunk_id):
+            features, labels = tf.numpy_function(read_chunk, [chunk_id], (tf.float32, tf.int32))
+            features.set_shape([None, pipeline.output_size])
+            labels.set_shape([None])
+            return features, labels
+        
+        dataset = tf.data.Dataset.range(num_chunks)
+        if training:
+            dataset = dataset.shuffle(num_chunks, reshuffle_each_iteration=True)
+        dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+        dataset = dataset.unbatch()
+        if training:
+            dataset = dataset.shuffle(SHUFFLE_BUFFER, reshuffle_each_iteration=True)
+        dataset = dataset.batch(self.hyperparams['batch_size'])
+        if not training:
+            spec = {**pipeline.spec(), 'pixel_landmarks': bool(pixel_landmarks)}
+            cache_path = validation_cache_path(indices, spec, self.hyperparams['batch_size'], self.validation_cache,
+                                               self.remove_stale_caches) if self.validation_cache else ''
+            dataset = dataset.cache(cache_path)
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    @staticmethod
+    def augment(points, rng):
+        """
+        Random in-plane rotation and jitter of normalized (n, 21, 3) points.
+        Position and scale are normalized away, so shifting or scaling would not help.
+        """
+        angle = rng.uniform(-0.25, 0.25, size=len(points))  # about +-15 degrees
+        cos, sin = np.cos(angle)[:, None], np.sin(angle)[:, None]
+        x, y = points[..., 0].copy(), points[..., 1]
+        points[..., 0] = cos * x - sin * y
+        points[..., 1] = sin * x + cos * y
+        points += rng.normal(scale=0.02, size=points.shape).astype(np.float32)
+        return points
+
+    def train(self, epochs=EPOCHS, save_path=MODEL_PATH, checkpoint_dir=CHECKPOINT_DIR):
+        """
+        Train the model using the saved dataset.
+        Stops early once validation accuracy plateaus. Pass save_path=None to skip saving.
+        """
+        read_rows, labels = self.open_dataset()
+        if read_rows is None:
             print("Dataset files not found. Please ensure data is collected and saved.")
             return None
 
-        # Load dataset
-        X = np.load(FEATURES_PATH)
-        y = np.load(LABELS_PATH)
-
-        # Shuffle and split dataset
-        indices = np.random.permutation(len(X))
-        split_idx = int(len(X) * (1 - VALIDATION_SPLIT))
-        train_idx, val_idx = indices[:split_idx], indices[split_idx:]
+        # Shuffle and split sample indices; features stay on disk
+        train_idx, val_idx = split_indices(len(labels))
 
-        X_train, y_train = X[train_idx], y[train_idx]
-        X_val, y_val = X[val_idx], y[val_idx]
+        train_dataset = self.make_dataset(read_rows, train_idx, training=True)
+        val_dataset = self.make_dataset(read_rows, val_idx, training=False)
 
         # Train the model
         print("\nTraining model...")
         history = self.model.fit(
-            X_train, y_train,
-            batch_size=BATCH_SIZE,
-            epochs=EPOCHS,
-            validation_data=(X_val, y_val)
+            train_dataset,
+            epochs=epochs,
+            validation_data=val_dataset,
+            callbacks=self.create_callbacks(len(train_idx), checkpoint_dir)
         )
 
         # Save the model
-        self.model.save(MODEL_PATH)
-        print(f"Model saved to {MODEL_PATH}")
+        if save_path:
+            self.save(save_path, 'full', len(labels), len(labels), history_path=save_path)
+        return history
+
+    def train_incremental(self, epochs=INCREMENTAL_EPOCHS, replay_ratio=REPLAY_RATIO,
+                          learning_rate=INCREMENTAL_LEARNING_RATE, model_path=MODEL_PATH, save_path=MODEL_PATH):
+        """
+        Fine-tune the saved model on the samples appended since it was trained.
+        Each new training sample is mixed with replay_ratio samples the model has
+        already seen so it does not forget them, and validation runs on the whole
+        validation split, old samples and new. The output layer grows when SIGNS
+        has new classes. Falls back to train() if there is no model trained on
+        this dataset to start from.
+        """
+        read_rows, labels = self.open_dataset()
+        if read_rows is None:
+            print("Dataset files not found. Please ensure data is collected and saved.")
+            return None
+
+        metadata = load_model_metadata(model_path)
+        seen = metadata.get('dataset', {}).get('samples')
+        if not os.path.exists(model_path) or seen is None or seen > len(labels):
+            print("No saved model trained on this dataset to fine-tune; training from scratch.")
+            return self.train(save_path=save_path)
+
+        train_idx, val_idx = split_indices(len(labels))
+        new_idx = train_idx[train_idx >= seen]
+        if not len(new_idx):
+            print(f"No new training samples since the model was trained on {seen}; nothing to fine-tune.")
+            return None
+
+        model = tf.keras.models.load_model(model_path)
+        old_classes = model.output_shape[-1]
+        if old_classes > len(SIGNS):
+            print(f"SIGNS has fewer classes than the saved model ({old_classes}); training from scratch.")
+            return self.train(save_path=save_path)
+        self.features = FeaturePipeline.from_spec(metadata['features'])  # keep the features the model knows
+        self.model = expand_output_layer(model, len(SIGNS))
+        self.model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                           loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+
+        # Replay a random sample of the training data the model has seen
+        old_idx = train_idx[train_idx < seen]
+        replay_size = min(len(old_idx), int(round(len(new_idx) * replay_ratio)))
+        replay_idx = np.random.default_rng().choice(old_idx, replay_size, replace=False)
+        fit_idx = np.concatenate([new_idx, replay_idx])
+
+        print(f"\nFine-tuning on {len(new_idx)} new and {replay_size} replayed samples "
+              f"({old_classes} -> {len(SIGNS)} classes)...")
+        history = self.model.fit(
+            self.make_dataset(read_rows, fit_idx, training=True),
+            epochs=epochs,
+            validation_data=self.make_dataset(read_rows, val_idx, training=False),
+            callbacks=self.create_callbacks(len(fit_idx), checkpoint_dir=None)  # short runs are not resumed
+        )
+
+        if save_path:
+            self.save(save_path, 'incremental', len(labels), len(labels) - seen, history_path=model_path)
         return history
+
+    def save(self, save_path, mode, num_samples, new_samples, history_path):
+        """
+        Saves the model with its metadata: the feature spec, the samples and
+        shards it has seen, and a version history (continued from the metadata
+        at history_path) with one entry per training run. Exports of the
+        previous model are dropped until export.py measures the new one.
+        """
+        versions = load_model_metadata(history_path).get('versions', [])
+        shards = dataset_coverage(num_samples)
+        versions.append({
+            'version': len(versions) + 1,
+            'mode': mode,
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'samples': num_samples,
+            'new_samples': new_samples,
+            'num_classes': self.model.output_shape[-1],
+            'shards': shards,
+        })
+        ensure_directories(os.path.dirname(save_path))
+        self.model.save(save_path)
+        save_model_metadata(save_path, features=self.features.spec(),
+                            dataset={'samples': num_samples, 'shards': shards}, versions=versions, exports={})
+        print(f"Model version {len(versions)} saved to {save_path}")
+
+def _run_trial(hyperparams, epochs, threads_per_worker):
+    # The worker's first trainer applies its share of the cores before TensorFlow starts
+    trainer = ModelTrainer(hyperparams, intra_op_threads=threads_per_worker, inter_op_threads=1)
+    if VALIDATION_CACHE:
+        # Trials run concurrently, so each worker caches under its own name and deletes nothing;
+        # the next regular training run removes these caches with the other stale ones
+        trainer.validation_cache = f"{VALIDATION_CACHE}.sweep{os.getpid()}"
+        trainer.remove_stale_caches = False
+    history = trainer.train(epochs=epochs, save_path=None, checkpoint_dir=None)
+    if history is None:
+        return hyperparams, None
+    return hyperparams, max(history.history['val_accuracy'])
+
+def run_sweep(trials, epochs=EPOCHS, workers=None):
+    """
+    Trains one model per hyperparameter dict in trials, in parallel across a
+    process pool, and returns (hyperparams, best val_accuracy) sorted best first.
+    The CPU cores are split evenly between the workers.
+    """
+    workers = workers or min(len(trials), os.cpu_count() or 1)
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    # TensorFlow is not fork-safe, so workers are started fresh
+    context = multiprocessing.get_context('spawn')
+    
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for hyperparams, accuracy in pool.map(_run_trial, trials, [epochs] * len(trials),
+                                              [threads_per_worker] * len(trials)):
+            print(f"Trial {hyperparams}: val_accuracy={accuracy}")
+            if accuracy is not None:
+                results.append((hyperparams, accuracy))
+    
+    results.sort(key=lambda result: result[1], reverse=True)
+    return results
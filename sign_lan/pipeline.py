@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+from capture import Camera
+from config import PIPELINE_QUEUE_SIZE, CAMERA_SOURCE
+
+
+class RingBuffer:
+    """
+    Bounded buffer between two pipeline stages.
+    When full, the oldest item is dropped so consumers always see fresh frames.
+    """
+    def __init__(self, name, maxsize=PIPELINE_QUEUE_SIZE):
+        self.name = name
+        self.items = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.closed = False
+        self.put_count = 0
+        self.drop_count = 0
+
+    def put(self, item):
+        with self.condition:
+            if len(self.items) == self.items.maxlen:
+                self.drop_count += 1  # deque drops the oldest item for us
+            self.items.append(item)
+            self.put_count += 1
+            self.condition.notify()
+
+    def get(self, timeout=0.1):
+        """Returns the oldest item, or None on timeout or when closed."""
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def depth(self):
+        return len(self.items)
+
+
+class PredictionPipeline:
+    """
+    Runs SignPredictor as four stages linked by ring buffers:
+    capture -> detect -> classify -> render.
+    Capture, detection and classification each run on their own thread;
+    rendering stays on the calling thread because OpenCV windows must.
+    """
+    def __init__(self, predictor, camera_source=CAMERA_SOURCE, queue_size=PIPELINE_QUEUE_SIZE):
+        self.predictor = predictor
+        self.camera_source = camera_source
+        self.frames = RingBuffer('capture', queue_size)
+        self.detections = RingBuffer('detect', queue_size)
+        self.results = RingBuffer('classify', queue_size)
+        self.lock = threading.Lock()  # guards predictor.current_word
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.frame_id = 0
+        self.rendered = 0
+        self.start_time = None
+        self.timer = predictor.instrumentation
+
+    def _capture(self, camera):
+        while not self.stop_event.is_set():
+            ret, frame = camera.read()
+            if not ret:
+                print("Failed to capture frame. Exiting...")
+                break
+            self.frame_id += 1
+            # Capture time, so the decoder's commit timing ignores pipeline delay.
+            # The flip allocates a new frame because it outlives the camera buffer in the queues.
+            self.frames.put((self.frame_id, cv2.flip(frame, 1), time.monotonic() * 1000.0))
+        self.stop_event.set()
+        self.frames.close()
+
+    def _detect(self):
+        detector = self.predictor.hand_detector
+        while not self.stop_event.is_set():
+            item = self.frames.get()
+            if item is None:
+                continue
+            frame_id, frame, timestamp = item
+            with self.timer.stage('detect'):
+                frame = detector.find_hands(frame)
+                features = self.predictor.hand_features(frame)
+            self.detections.put((frame_id, frame, features, timestamp))
+        self.detections.close()
+
+    def _classify(self):
+        while not self.stop_event.is_set():
+            item = self.detections.get()
+            if item is None:
+                continue
+            frame_id, frame, features, timestamp = item
+            with self.timer.stage('predict'):
+                probabilities = self.predictor.engine.predict(features)[0] if features is not None else None
+            with self.lock:
+                current_prediction, confidence = self.predictor.update_word(probabilities, timestamp)
+            self.results.put((frame_id, frame, current_prediction, confidence))
+        self.results.close()
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def run(self):
+        """Run the pipeline until 'q' is pressed or the camera stops."""
+        camera = Camera(self.camera_source)
+        if not camera.is_opened():
+            print("Error: Could not open the camera.")
+            return
+
+        self.predictor._open_window()
+        self.start_time = time.perf_counter()
+        self._start(self._capture, camera)
+        self._start(self._detect)
+        self._start(self._classify)
+
+        try:
+            while not self.stop_event.is_set():
+                item = self.results.get()
+                if item is None:
+                    # Keep the window responsive while the other stages catch up
+                    if not self._handle_key(cv2.waitKey(1)):
+                        break
+                    continue
+
+                _, frame, current_prediction, confidence = item
+                with self.lock:
+                    self.predictor.draw_prediction(frame, current_prediction, confidence)
+                    self.predictor.draw_word(frame)
+                self.timer.draw_overlay(frame)
+                with self.timer.stage('imshow'):
+                    cv2.imshow('Sign Language Prediction', frame)
+                self.timer.frame_done()
+                self.rendered += 1
+                if not self._handle_key(cv2.waitKey(1)):
+                    break
+        finally:
+            self.stop()
+            camera.release()
+            cv2.destroyAllWindows()
+            self.predictor.hand_detector.release()
+            self.report()
+            self.timer.close()
+
+    def report(self):
+        """Print the final stats and add the drop counters to the instrumentation metrics."""
+        stats = self.stats()
+        print(f"Pipeline stopped: {stats['rendered']} of {stats['captured']} frames rendered "
+              f"({stats['fps']:.1f} FPS)")
+        for name, stage in stats['stages'].items():
+            print(f"  {name}: {stage['put']} queued, {stage['dropped']} dropped, {stage['depth']} left")
+            self.timer.count(f'{name}_dropped', stage['dropped'])
+
+    def _handle_key(self, key):
+        with self.lock:
+            return self.predictor.handle_key(key)
+
+    def stop(self):
+        """Signal all stages to finish and wait for them."""
+        self.stop_event.set()
+        for buffer in (self.frames, self.detections, self.results):
+            buffer.close()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
+
+    def stats(self):
+        """Per-stage queue depth and drop counters, plus the rendered frame rate."""
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0
+        return {
+            'stages': {
+                buffer.name: {
+                    'depth': buffer.depth(),
+                    'put': buffer.put_count,
+                    'dropped': buffer.drop_count,
+                }
+                for buffer in (self.frames, self.detections, self.results)
+            },
+            'captured': self.frame_id,
+            'rendered': self.rendered,
+            'fps': self.rendered / elapsed if elapsed > 0 else 0.0,
+        }
@@ -1,104 +1,435 @@
+import json
+import os
 import cv2
 import numpy as np
-import tensorflow as tf
 from config import *
-from hand_detector import HandDetector
+from features import load_feature_pipeline
+from model_metadata import load_model_metadata
+from temporal_decoder import create_decoder
+from word_decoder import create_word_decoder, SPACE_SIGN
+from instrumentation import Instrumentation
+
+class InferenceEngine:
+    """
+    Base class for classifier backends. predict() maps (n, features) to (n, classes).
+    model_path is kept so the feature pipeline saved with the model can be found.
+    """
+    name = 'base'
+    model_path = MODEL_PATH
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+class NumpyEngine(InferenceEngine):
+    """
+    Runs the Dense stack from ModelTrainer.create_model in plain NumPy.
+    Weights are read straight out of the Keras .h5 file, so TensorFlow is not needed.
+    Dropout layers are skipped since they are inactive at inference time.
+    """
+    name = 'numpy'
+    activations = {
+        'relu': lambda x: np.maximum(x, 0, out=x),
+        'linear': lambda x: x,
+        'softmax': None,  # handled separately for numerical stability
+    }
+
+    def __init__(self, model_path=MODEL_PATH):
+        import h5py
+        
+        self.model_path = model_path
+        self.layers = []
+        with h5py.File(model_path, 'r') as f:
+            config = f.attrs['model_config']
+            if isinstance(config, bytes):
+                config = config.decode('utf-8')
+            config = json.loads(config)
+            weights = f['model_weights']
+            for layer in config['config']['layers']:
+                if layer['class_name'] != 'Dense':
+                    continue
+                layer_config = layer['config']
+                activation = layer_config.get('activation', 'linear')
+                if activation not in self.activations:
+                    raise ValueError(f"Unsupported activation '{activation}' in layer {layer_config['name']}")
+                kernel, bias = self._find_weights(weights[layer_config['name']])
+                self.layers.append((kernel, bias, activation))
+        
+        if not self.layers:
+            raise ValueError(f"No Dense layers found in {model_path}")
+        self.input_size = self.layers[0][0].shape[0]
+        self.num_classes = self.layers[-1][0].shape[1]
+
+    @staticmethod
+    def _find_weights(group):
+        """Finds the kernel and bias datasets inside a layer group (Keras 2 and 3 layouts)."""
+        found = {}
+        def visit(name, obj):
+            leaf = name.rsplit('/', 1)[-1].split(':')[0]
+            if leaf in ('kernel', 'bias') and leaf not in found:
+                found[leaf] = np.asarray(obj, dtype=np.float32)
+        group.visititems(visit)
+        bias = found.get('bias')
+        if bias is None:
+            bias = np.zeros(found['kernel'].shape[1], dtype=np.float32)
+        return found['kernel'], bias
+
+    def predict(self, batch):
+        return self._forward(batch, self.layers)
+
+    def embed(self, batch):
+        """Output of the last hidden layer, the network's learned embedding of the features."""
+        return self._forward(batch, self.layers[:-1])
+
+    def _forward(self, batch, layers):
+        x = np.asarray(batch, dtype=np.float32).reshape(-1, self.input_size)
+        for kernel, bias, activation in layers:
+            x = x @ kernel
+            x += bias
+            if activation == 'softmax':
+                x -= x.max(axis=1, keepdims=True)
+                np.exp(x, out=x)
+                x /= x.sum(axis=1, keepdims=True)
+            else:
+                x = self.activations[activation](x)
+        return x
+
+class KerasEngine(InferenceEngine):
+    """Calls the Keras model through a traced tf.function, avoiding model.predict overhead."""
+    name = 'keras'
+
+    def __init__(self, model_path=MODEL_PATH):
+        import tensorflow as tf
+        
+        self.model_path = model_path
+        self.tf = tf
+        self.model = tf.keras.models.load_model(model_path)
+        self.input_size = self.model.input_shape[-1]
+        self._call = tf.function(
+            lambda x: self.model(x, training=False),
+            input_signature=[tf.TensorSpec([None, self.input_size], tf.float32)]
+        )
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32).reshape(-1, self.input_size)
+        return self._call(self.tf.constant(x)).numpy()
+
+class TFLiteEngine(InferenceEngine):
+    """Runs a converted .tflite model with tflite_runtime, or TensorFlow's interpreter as a fallback."""
+    name = 'tflite'
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH):
+        self.model_path = model_path
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        
+        self.interpreter = Interpreter(model_path=model_path)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self.input_size = self.input_detail['shape'][-1]
+        self.batch_size = 1
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32).reshape(-1, self.input_size)
+        if len(x) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_detail['index'], x.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(x)
+        self.interpreter.set_tensor(self.input_detail['index'], x)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_detail['index'])
+
+class OnnxEngine(InferenceEngine):
+    """Runs an exported .onnx model with onnxruntime (optional dependency)."""
+    name = 'onnx'
+
+    def __init__(self, model_path=ONNX_MODEL_PATH):
+        import onnxruntime
+        
+        self.model_path = model_path
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.input_size = self.session.get_inputs()[0].shape[-1]
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32).reshape(-1, self.input_size)
+        return self.session.run(None, {self.input_name: x})[0]
+
+class NearestNeighbourEngine(InferenceEngine):
+    """
+    Classifies by the nearest enrolled samples in a KNNIndex (knn_index.py)
+    rather than a trained network, so signs and signers can be added in seconds
+    without retraining. class_names lists the index's classes, which start as
+    SIGNS and may continue with enrolled signs.
+    """
+    name = 'knn'
+
+    def __init__(self, model_path=KNN_INDEX_PATH, neighbours=KNN_NEIGHBOURS):
+        from knn_index import KNNIndex
+
+        self.model_path = model_path  # the index's metadata holds its feature pipeline
+        self.index = KNNIndex.load(model_path)
+        self.neighbours = neighbours
+        self.embed = NumpyEngine(self.index.model_path).embed if self.index.embedding == 'model' else None
+        self.input_size = self.index.features['output_size']
+        self.class_names = self.index.classes
+
+    def predict(self, batch):
+        x = np.asarray(batch, dtype=np.float32).reshape(-1, self.input_size)
+        if self.embed is not None:
+            x = self.embed(x)
+        return self.index.predict_proba(x, self.neighbours)
+
+INFERENCE_ENGINES = {
+    NumpyEngine.name: NumpyEngine,
+    KerasEngine.name: KerasEngine,
+    TFLiteEngine.name: TFLiteEngine,
+    OnnxEngine.name: OnnxEngine,
+    NearestNeighbourEngine.name: NearestNeighbourEngine,
+}
+
+def create_auto_engine(model_path=MODEL_PATH):
+    """
+    The fastest engine recorded by export.py for this model, among the artifacts
+    that passed the accuracy gate and can be loaded here; NumpyEngine otherwise.
+    """
+    exports = load_model_metadata(model_path).get('exports', {})
+    ranked = sorted((entry['latency_ms'], backend, entry['path']) for backend, entry in exports.items()
+                    if entry.get('accepted') and entry.get('latency_ms') is not None)
+    for _, backend, path in ranked:
+        if not os.path.exists(path):
+            continue
+        try:
+            return INFERENCE_ENGINES[backend](path)
+        except ImportError:
+            continue  # runtime not installed on this host
+    return NumpyEngine(model_path)
+
+def create_engine(backend=INFERENCE_BACKEND):
+    """Create the inference engine named in config.INFERENCE_BACKEND."""
+    if backend == 'auto':
+        return create_auto_engine()
+    if backend not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference backend '{backend}'. Choose from {list(INFERENCE_ENGINES) + ['auto']}")
+    return INFERENCE_ENGINES[backend]()
 
 class SignPredictor:
-    def __init__(self):
-        """Initialize the predictor with hand detector and model."""
-        self.hand_detector = HandDetector()
-        self.model = tf.keras.models.load_model(MODEL_PATH)
-        self.current_word = []
-        self.last_prediction = None
-        self.prediction_count = 0
+    def __init__(self, backend=INFERENCE_BACKEND, hand_detector=None, verbose=True, decoder=DECODER, engine=None,
+                 instrumentation=None, word_decoding=WORD_DECODING):
+        """Initialize the predictor with hand detector and inference engine."""
+        if hand_detector is None:
+            from hand_detector import HandDetector  # MediaPipe is only needed when no detector is given
+            hand_detector = HandDetector(max_hands=MAX_HANDS, adaptive=ADAPTIVE_DETECTION)
+        self.hand_detector = hand_detector
+        self.engine = engine or create_engine(backend)
+        self.features = load_feature_pipeline(self.engine.model_path)
+        if getattr(self.engine, 'input_size', self.features.output_size) != self.features.output_size:
+            raise ValueError(f"Model {self.engine.model_path} expects {self.engine.input_size} inputs but its "
+                             f"feature pipeline (version {self.features.version}) builds {self.features.output_size}")
+        self.class_names = getattr(self.engine, 'class_names', SIGNS)  # class id -> sign name
+        self.decoder = create_decoder(decoder)
+        self.words = create_word_decoder() if word_decoding else None  # None without a word list
+        self.verbose = verbose
+        self.current_word = []  # finished text; the word being decoded is kept by self.words
+        self.instrumentation = instrumentation or Instrumentation()
+
+    def hand_features(self, frame, max_hands=1):
+        """
+        Model features for the hands found by the last find_hands call on frame,
+        shape (hands, features), or None when no hand was found.
+        """
+        landmarks = self.hand_detector.get_landmark_batch(frame)
+        if landmarks is None:
+            return None
+        landmarks = landmarks[:max_hands]
+        return self.features.transform(landmarks, frame.shape[1], self.hand_detector.left_hand[:len(landmarks)])
+
+    def predict_proba(self, landmarks, frame_width=CAMERA_WIDTH, left_hand=None):
+        """Class probabilities for one set of hand landmarks (as returned by get_landmark_array)."""
+        return self.engine.predict(self.features.transform(landmarks, frame_width, left_hand))[0]
 
     def predict_sign(self, landmarks):
         """Predict the sign from hand landmarks."""
         if landmarks is None:
             return None, 0
         
-        landmarks = landmarks.reshape(1, -1)
-        prediction = self.model.predict(landmarks, verbose=0)
-        predicted_class = np.argmax(prediction[0])
-        confidence = prediction[0][predicted_class]
+        prediction = self.predict_proba(landmarks)
+        predicted_class = int(np.argmax(prediction))
+        confidence = float(prediction[predicted_class])
         
         return predicted_class, confidence
 
-    def run_prediction(self):
-        """Run real-time sign language prediction."""
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Error: Could not open the camera.")
-            return
+    def predict_batch(self, batch, frame_width=CAMERA_WIDTH, left_hand=None):
+        """Predict signs for a (n, 63) batch of landmarks. Returns arrays of classes and confidences."""
+        prediction = self.engine.predict(self.features.transform(batch, frame_width, left_hand))
+        predicted_classes = np.argmax(prediction, axis=1)
+        confidences = prediction[np.arange(len(prediction)), predicted_classes]
+        return predicted_classes, confidences
+
+    def update_word(self, probabilities, timestamp=None):
+        """
+        Feed one frame's class probabilities (None when no hand was found) to the
+        temporal decoder and add any letters it commits. With word decoding,
+        letters go to the word decoder and the SPACE sign ends the word.
+        Returns (predicted sign, confidence) to display; the sign is None below
+        the confidence threshold.
+        """
+        for class_id in self.decoder.update(probabilities, timestamp):
+            letter = self.class_names[class_id]
+            if self.words is None:
+                self.current_word.append(letter)
+            elif letter == SPACE_SIGN:
+                self.finish_word()
+                continue
+            elif self.words.is_letter(class_id):
+                self.words.add(class_id, self.decoder.distribution())
+            else:  # a whole-word sign enrolled in the nearest-neighbour index
+                self.finish_word()
+                self.current_word.extend(letter + ' ')
+            if self.verbose:
+                print(f"Letter added: {letter}")
         
+        predicted_class, confidence = self.decoder.current()
+        if predicted_class is None or confidence <= CONFIDENCE_THRESHOLD:
+            return None, confidence
+        return self.class_names[predicted_class], confidence
+
+    def finish_word(self, suggestion=None):
+        """
+        End the word being decoded and add its best spelling, or the suggestion
+        with the given index, to the text followed by a space.
+        """
+        if self.words is None:
+            return
+        word = self.words.finish() if suggestion is None else self.words.accept(suggestion)
+        if word:
+            self.current_word.extend(word + ' ')
+            if self.verbose:
+                print(f"Word added: {word}")
+
+    def text(self):
+        """The finished text followed by the best spelling of the word being signed."""
+        pending = self.words.hypothesis() if self.words is not None else ''
+        return ''.join(self.current_word) + pending
+
+    def draw_prediction(self, frame, current_prediction, confidence):
+        """Display the current prediction on the frame."""
+        if current_prediction is None:
+            return
+        cv2.putText(frame, f"Predicted: {current_prediction} ({confidence:.2f})",
+                  (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+
+    def draw_word(self, frame):
+        """Display the current word, and any word suggestions, on the frame."""
+        current_text = self.text()
+        cv2.putText(frame, f"Word: {current_text}", (10, 100),
+                   cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+        suggestions = self.words.suggestions() if self.words is not None else []
+        if suggestions:
+            cv2.putText(frame, f"Suggestions: {'  '.join(suggestions)}", (10, 150),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 0, 255), 2)
+
+    def handle_key(self, key):
+        """Apply a key press to the current word. Returns False to quit."""
+        if key & 0xFF == ord('q'):
+            return False
+        elif key == 32:  # SPACE
+            if self.words is not None and self.words.letters:
+                self.finish_word()
+            else:
+                self.current_word.append(' ')
+                print("Space added")
+        elif key == 9:  # TAB
+            if self.words is not None and self.words.suggestions():
+                self.finish_word(suggestion=0)
+        elif key == 8:  # BACKSPACE
+            removed = self.words.backspace() if self.words is not None else None
+            if removed is None and self.current_word:
+                removed = self.current_word.pop()
+            if removed is not None:
+                print(f"Removed: {removed}")
+        elif key == 13:  # ENTER
+            self.current_word = []  # Clear the text
+            if self.words is not None:
+                self.words.reset()
+            print("Text cleared")
+        return True
+
+    def _open_window(self):
         cv2.namedWindow('Sign Language Prediction', cv2.WND_PROP_FULLSCREEN)
         cv2.setWindowProperty('Sign Language Prediction', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
         
         print("\nSign Language Prediction Started")
         print("Controls:")
         print("- Press SPACE to add a space")
+        if self.words is not None:
+            print("- Press TAB to accept the first word suggestion")
         print("- Press BACKSPACE to delete last character")
         print("- Press ENTER to clear the text")
         print("- Press 'q' to quit")
+
+    def run_prediction(self, pipelined=PIPELINED_PREDICTION):
+        """
+        Run real-time sign language prediction.
+        With pipelined=True, capture, detection, classification and display
+        run as separate stages (see pipeline.py).
+        """
+        if pipelined:
+            from pipeline import PredictionPipeline
+            pipeline = PredictionPipeline(self)
+            pipeline.run()
+            return pipeline.stats()
         
-        while cap.isOpened():
-            ret, frame = cap.read()
+        from capture import Camera
+        
+        camera = Camera()
+        if not camera.is_opened():
+            print("Error: Could not open the camera.")
+            return
+        
+        self._open_window()
+        timer = self.instrumentation
+        self.hand_detector.instrumentation = timer
+        
+        while True:
+            with timer.stage('capture'):
+                ret, frame = camera.read()
             if not ret:
                 print("Failed to capture frame. Exiting...")
                 break
             
-            frame = cv2.flip(frame, 1)  # Mirror image
+            with timer.stage('flip'):
+                frame = camera.flip(frame)  # Mirror image
             frame = self.hand_detector.find_hands(frame)
-            landmarks = self.hand_detector.get_landmark_array(frame)
-            
-            if landmarks is not None:
-                predicted_class, confidence = self.predict_sign(landmarks)
-                
-                if confidence > CONFIDENCE_THRESHOLD:
-                    current_prediction = SIGNS[predicted_class]
-                    
-                    if current_prediction == self.last_prediction:
-                        self.prediction_count += 1
-                    else:
-                        self.prediction_count = 0
-                    
-                    if self.prediction_count == 10:  # Add letter after consistent prediction
-                        self.current_word.append(current_prediction)
-                        print(f"Letter added: {current_prediction}")
-                        self.prediction_count = 0
-                    
-                    self.last_prediction = current_prediction
-                    
-                    # Display prediction
-                    cv2.putText(frame, f"Predicted: {current_prediction} ({confidence:.2f})",
-                              (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            with timer.stage('landmarks'):
+                features = self.hand_features(frame)
             
-            # Display current word
-            current_text = ''.join(self.current_word)
-            cv2.putText(frame, f"Word: {current_text}", (10, 100),
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+            with timer.stage('predict'):
+                probabilities = self.engine.predict(features)[0] if features is not None else None
+            with timer.stage('decode'):
+                current_prediction, confidence = self.update_word(probabilities)
+            with timer.stage('putText'):
+                self.draw_prediction(frame, current_prediction, confidence)
+                self.draw_word(frame)
+            timer.draw_overlay(frame)
             
-            cv2.imshow('Sign Language Prediction', frame)
-            key = cv2.waitKey(1)
-            
-            if key & 0xFF == ord('q'):
+            with timer.stage('imshow'):
+                cv2.imshow('Sign Language Prediction', frame)
+                key = cv2.waitKey(1)
+            timer.frame_done()
+            if not self.handle_key(key):
                 break
-            elif key == 32:  # SPACE
-                self.current_word.append(' ')
-                print("Space added")
-            elif key == 8:  # BACKSPACE
-                if self.current_word:
-                    removed = self.current_word.pop()
-                    print(f"Removed: {removed}")
-            elif key == 13:  # ENTER
-                self.current_word = []  # Clear the text
-                print("Text cleared")
 
         # Cleanup
-        cap.release()
+        camera.release()
         cv2.destroyAllWindows()
         self.hand_detector.release()
+        timer.close()
 
 if __name__ == "__main__":
     predictor = SignPredictor()
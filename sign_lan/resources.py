@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+
+from config import (INFERENCE_BACKEND, MODEL_PATH, TFLITE_MODEL_PATH, ONNX_MODEL_PATH, KNN_INDEX_PATH, MAX_HANDS,
+                    ADAPTIVE_DETECTION, SAMPLES_PER_SIGN)
+from model_metadata import metadata_path
+
+# Model file each backend loads, used to notice when training replaced it
+ENGINE_MODEL_PATHS = {
+    'numpy': MODEL_PATH,
+    'keras': MODEL_PATH,
+    'tflite': TFLITE_MODEL_PATH,
+    'onnx': ONNX_MODEL_PATH,
+    'auto': metadata_path(MODEL_PATH),  # export.py records the artifacts to choose from here
+    'knn': metadata_path(KNN_INDEX_PATH),  # rewritten whenever the index is saved
+}
+
+
+class ResourceManager:
+    """
+    Keeps hand detectors and inference engines alive for the life of the app,
+    so repeated actions skip MediaPipe graph setup and model loading.
+    An engine is reloaded only when its model file's modification time changes.
+    Access is thread-safe so background workers can share the cache.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.detectors = {}
+        self.engines = {}  # backend -> (model mtime, engine)
+        self.collector = None
+
+    def get_detector(self, **kwargs):
+        """A cached HandDetector for the given constructor arguments."""
+        key = tuple(sorted(kwargs.items()))
+        with self.lock:
+            if key not in self.detectors:
+                from hand_detector import HandDetector
+                self.detectors[key] = HandDetector(**kwargs)
+            return self.detectors[key]
+
+    def get_engine(self, backend=INFERENCE_BACKEND):
+        """A cached inference engine, reloaded if the model file changed on disk."""
+        from predictor import create_engine
+
+        model_path = ENGINE_MODEL_PATHS.get(backend, MODEL_PATH)
+        mtime = os.path.getmtime(model_path) if os.path.exists(model_path) else None
+        with self.lock:
+            cached = self.engines.get(backend)
+            if cached is None or cached[0] != mtime:
+                if cached is not None:
+                    print(f"Model file changed, reloading {backend} engine")
+                self.engines[backend] = (mtime, create_engine(backend))
+            return self.engines[backend][1]
+
+    def get_predictor(self, backend=INFERENCE_BACKEND):
+        """A SignPredictor with a fresh word and decoder, sharing the cached engine and detector."""
+        from predictor import SignPredictor
+
+        detector = self.get_detector(max_hands=MAX_HANDS, adaptive=ADAPTIVE_DETECTION)
+        return SignPredictor(backend=backend, hand_detector=detector, engine=self.get_engine(backend))
+
+    def get_collector(self):
+        """The DataCollector, created once with its own single-hand detector."""
+        with self.lock:
+            if self.collector is None:
+                from data_collector import DataCollector
+                detector = self.get_detector(static_mode=False, max_hands=1,
+                                             detection_confidence=0.5, tracking_confidence=0.5)
+                self.collector = DataCollector(hand_detector=detector, num_samples=SAMPLES_PER_SIGN)
+            return self.collector
+
+    def release(self):
+        with self.lock:
+            for detector in self.detectors.values():
+                detector.release()
+            self.detectors.clear()
+            self.engines.clear()
+            if self.collector is not None:
+                self.collector.store.close()
+                self.collector = None
+
+
+class BackgroundWorker:
+    """
+    Runs long tasks one at a time on a background thread and hands their
+    results back to the Tk thread, which must call poll() periodically (see
+    attach()). Tkinter widgets must only be touched from the Tk thread.
+    """
+    def __init__(self):
+        self.tasks = queue.Queue()
+        self.callbacks = queue.Queue()
+        self.busy = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, task, on_done=None, on_error=None):
+        """
+        Run task() in the background, then on_done(result) or on_error(exception) on the Tk thread.
+        Call from the Tk thread; raises RuntimeError while an earlier task is still running.
+        """
+        if self.busy:
+            raise RuntimeError("A background task is already running")
+        self.busy = True
+        self.tasks.put((task, on_done, on_error))
+
+    def post(self, callback, *args):
+        """Schedule callback(*args) on the Tk thread; safe to call from the task."""
+        self.callbacks.put((callback, args))
+
+    def _run(self):
+        while True:
+            task, on_done, on_error = self.tasks.get()
+            try:
+                result = task()
+            except Exception as e:
+                callback, args = on_error, (e,)
+            else:
+                callback, args = on_done, (result,)
+            self.post(self._set_idle)  # before the callback, so it may submit the next task
+            if callback:
+                self.post(callback, *args)
+
+    def _set_idle(self):
+        self.busy = False
+
+    def poll(self):
+        """Run pending callbacks. Call from the Tk thread only."""
+        while True:
+            try:
+                callback, args = self.callbacks.get_nowait()
+            except queue.Empty:
+                return
+            callback(*args)
+
+    def attach(self, root, interval_ms=50):
+        """Poll for results from the Tk event loop every interval_ms."""
+        def tick():
+            self.poll()
+            root.after(interval_ms, tick)
+        root.after(interval_ms, tick)
@@ -0,0 +1,278 @@
+import time
+
+import numpy as np
+from config import (DECODER, CONFIDENCE_THRESHOLD, RELEASE_THRESHOLD, EMA_ALPHA, COMMIT_HOLD_MS, REPEAT_HOLD_MS,
+                    BLANK_MS, CTC_BEAM_WIDTH, CTC_WINDOW_MS)
+
+
+def now_ms():
+    return time.monotonic() * 1000.0
+
+
+class TemporalDecoder:
+    """
+    Turns a stream of per-frame class probabilities into committed letters.
+    update() takes the softmax vector of one frame (None when no hand was found)
+    and a timestamp in milliseconds, and returns the class ids committed by it.
+    """
+    def update(self, probabilities, timestamp=None):
+        raise NotImplementedError
+
+    def current(self):
+        """The (class id, confidence) to display for the latest frame, or (None, 0)."""
+        raise NotImplementedError
+
+    def distribution(self):
+        """The class probabilities current() is based on, or None (word_decoder.py ranks letters with them)."""
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+
+class EMADecoder(TemporalDecoder):
+    """
+    Smooths the probabilities with an exponential moving average and commits a
+    class once it has stayed above the commit threshold for hold_ms.
+    Hysteresis: a class stays the candidate until it falls below release_threshold,
+    so one held sign commits once (again every repeat_ms if repeat_ms is set).
+    Frames without a hand leave the average and the hold timer alone until the
+    hand has been missing for blank_ms, so missed detections do not restart a sign.
+    """
+    def __init__(self, alpha=EMA_ALPHA, commit_threshold=CONFIDENCE_THRESHOLD,
+                 release_threshold=RELEASE_THRESHOLD, hold_ms=COMMIT_HOLD_MS, repeat_ms=REPEAT_HOLD_MS,
+                 blank_ms=BLANK_MS):
+        self.alpha = alpha
+        self.commit_threshold = commit_threshold
+        self.release_threshold = release_threshold
+        self.hold_ms = hold_ms
+        self.repeat_ms = repeat_ms
+        self.blank_ms = blank_ms
+        self.reset()
+
+    def reset(self):
+        self.average = None
+        self.candidate = None
+        self.candidate_since = 0.0
+        self.last_commit = None  # time of the last commit for the current candidate
+        self.missing_since = None  # first frame of the current run without a hand
+
+    def update(self, probabilities, timestamp=None):
+        timestamp = now_ms() if timestamp is None else timestamp
+        if self.missing_since is not None and timestamp - self.missing_since >= self.blank_ms:
+            self.reset()  # the hand was gone long enough to end the sign
+        if probabilities is None:
+            if self.missing_since is None and self.average is not None:
+                self.missing_since = timestamp
+            return []
+        self.missing_since = None
+
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        if self.average is None:
+            self.average = probabilities.copy()
+        else:
+            self.average *= 1 - self.alpha
+            self.average += self.alpha * probabilities
+
+        best = int(np.argmax(self.average))
+        if self.candidate is not None and (best != self.candidate
+                                           or self.average[self.candidate] < self.release_threshold):
+            self.candidate = None
+        if self.candidate is None and self.average[best] >= self.commit_threshold:
+            self.candidate = best
+            self.candidate_since = timestamp
+            self.last_commit = None
+
+        if self.candidate is None:
+            return []
+        if self.last_commit is None:
+            if timestamp - self.candidate_since >= self.hold_ms:
+                self.last_commit = timestamp
+                return [self.candidate]
+        elif self.repeat_ms and timestamp - self.last_commit >= self.repeat_ms:
+            self.last_commit = timestamp
+            return [self.candidate]
+        return []
+
+    def current(self):
+        if self.average is None:
+            return None, 0
+        best = int(np.argmax(self.average))
+        return best, float(self.average[best])
+
+    def distribution(self):
+        return self.average
+
+
+class CTCDecoder(TemporalDecoder):
+    """
+    Online CTC prefix beam search. Each frame is treated as a distribution over
+    the classes plus a blank. Whether a frame is blank follows the same
+    hysteresis as EMADecoder: a sign starts once the confidence reaches
+    commit_threshold and ends when it drops below release_threshold or the
+    hand disappears. Consecutive frames are strongly correlated, so a soft
+    per-frame blank would keep spawning double-letter hypotheses.
+
+    Frames are grouped into segments (a blank, or a run of one top class). A
+    new segment only counts once it has lasted hold_ms for a sign or blank_ms
+    for a blank; until then its frames are decoded as a repeat of the segment
+    before it, so misclassified frames and missed detections inside a held
+    sign are ignored. A held sign collapses to one letter; a blank between two
+    identical signs yields a double letter. Letters are committed once all
+    likely beams (at least min_mass of the probability) agree on them, or
+    after window_ms at the latest.
+    """
+    def __init__(self, beam_width=CTC_BEAM_WIDTH, window_ms=CTC_WINDOW_MS, min_mass=0.05,
+                 commit_threshold=CONFIDENCE_THRESHOLD, release_threshold=RELEASE_THRESHOLD,
+                 hold_ms=COMMIT_HOLD_MS, blank_ms=BLANK_MS):
+        self.beam_width = beam_width
+        self.commit_threshold = commit_threshold
+        self.release_threshold = release_threshold
+        self.window_ms = window_ms
+        self.min_mass = min_mass
+        self.hold_ms = hold_ms
+        self.blank_ms = blank_ms
+        self.reset()
+
+    def reset(self):
+        # prefix (tuple of class ids) -> [probability ending in blank, probability ending in a class]
+        self.beams = {(): [1.0, 0.0]}
+        self.context = None  # last committed class, so a held sign is not committed twice
+        self.in_sign = False
+        self.pending_since = None
+        self.last_probabilities = None
+        self.segment = None             # top class of the segment being decoded, None for a blank
+        self.segment_probabilities = None  # its latest probabilities, decoded in place of unconfirmed frames
+        self.next_segment = None        # (top class, first timestamp) of a sign not confirmed yet
+        self.blank_since = None         # first timestamp of a blank not confirmed yet
+
+    def _segment(self, probabilities, timestamp):
+        """
+        The probabilities to decode for this frame (None for a blank): the
+        frame's own once its segment is confirmed, the confirmed segment's
+        while a new sign is shorter than hold_ms or a blank shorter than
+        blank_ms. Short blanks do not interrupt a sign waiting to be confirmed.
+        """
+        label = None
+        if probabilities is not None:
+            confidence = float(probabilities.max())
+            if self.in_sign and confidence < self.release_threshold:
+                self.in_sign = False
+            elif not self.in_sign and confidence >= self.commit_threshold:
+                self.in_sign = True
+            if self.in_sign:
+                label = int(np.argmax(probabilities))
+
+        if label is None:
+            self.in_sign = False
+            if self.blank_since is None:
+                self.blank_since = timestamp
+            if timestamp - self.blank_since < self.blank_ms:
+                return self.segment_probabilities
+            self.segment = self.segment_probabilities = self.next_segment = None
+            return None
+
+        self.blank_since = None
+        if label != self.segment:
+            if self.next_segment is None or self.next_segment[0] != label:
+                self.next_segment = (label, timestamp)
+            if timestamp - self.next_segment[1] < self.hold_ms:
+                return self.segment_probabilities
+            self.segment = label
+        self.next_segment = None
+        self.segment_probabilities = probabilities
+        return probabilities
+
+    def _extend(self, probabilities):
+        """Advance the beams by one frame inside a sign."""
+        # Only classes with meaningful mass are worth extending the beams with
+        candidates = np.flatnonzero(probabilities > 1e-3)
+
+        new_beams = {}
+        def add(prefix, p_blank, p_label):
+            entry = new_beams.setdefault(prefix, [0.0, 0.0])
+            entry[0] += p_blank
+            entry[1] += p_label
+
+        for prefix, (p_blank, p_label) in self.beams.items():
+            total = p_blank + p_label
+            last = prefix[-1] if prefix else self.context
+            for c in candidates:
+                p = float(probabilities[c])
+                if c == last:
+                    add(prefix, 0.0, p_label * p)           # repeat collapses
+                    add(prefix + (int(c),), 0.0, p_blank * p)  # blank in between: new letter
+                else:
+                    add(prefix + (int(c),), 0.0, total * p)
+
+        best = sorted(new_beams.items(), key=lambda item: sum(item[1]), reverse=True)[:self.beam_width]
+        norm = sum(sum(value) for _, value in best) or 1.0
+        self.beams = {prefix: [value[0] / norm, value[1] / norm] for prefix, value in best}
+
+    def _commit(self, count):
+        """Remove the first count labels from every beam that shares them."""
+        committed = max(self.beams.items(), key=lambda item: sum(item[1]))[0][:count]
+        beams = {}
+        for prefix, value in self.beams.items():
+            if prefix[:count] == committed:
+                beams[prefix[count:]] = value
+        norm = sum(sum(value) for value in beams.values()) or 1.0
+        self.beams = {prefix: [value[0] / norm, value[1] / norm] for prefix, value in beams.items()}
+        self.context = committed[-1]
+        return list(committed)
+
+    def update(self, probabilities, timestamp=None):
+        timestamp = now_ms() if timestamp is None else timestamp
+        if probabilities is not None:
+            probabilities = np.asarray(probabilities, dtype=np.float32)
+        self.last_probabilities = probabilities
+        frame = self._segment(probabilities, timestamp)
+        if frame is None:  # blank
+            self.beams = {prefix: [p_blank + p_label, 0.0] for prefix, (p_blank, p_label) in self.beams.items()}
+        else:
+            self._extend(frame)
+
+        # Labels every likely beam agrees on are final
+        prefixes = [prefix for prefix, value in self.beams.items() if sum(value) >= self.min_mass]
+        agreed = min(len(prefix) for prefix in prefixes)
+        for i in range(agreed):
+            if len({prefix[i] for prefix in prefixes}) > 1:
+                agreed = i
+                break
+        best_prefix = max(self.beams.items(), key=lambda item: sum(item[1]))[0]
+
+        if agreed > 0:
+            self.pending_since = None
+            return self._commit(agreed)
+
+        if best_prefix:
+            if self.pending_since is None:
+                self.pending_since = timestamp
+            elif timestamp - self.pending_since >= self.window_ms:
+                self.pending_since = None
+                return self._commit(1)
+        else:
+            self.pending_since = None
+        return []
+
+    def current(self):
+        if self.last_probabilities is None:
+            return None, 0
+        best = int(np.argmax(self.last_probabilities))
+        return best, float(self.last_probabilities[best])
+
+    def distribution(self):
+        return self.last_probabilities
+
+
+DECODERS = {
+    'ema': EMADecoder,
+    'ctc': CTCDecoder,
+}
+
+
+def create_decoder(name=DECODER):
+    """Create the temporal decoder named in config.DECODER."""
+    if name not in DECODERS:
+        raise ValueError(f"Unknown decoder '{name}'. Choose from {list(DECODERS)}")
+    return DECODERS[name]()
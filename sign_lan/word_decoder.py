@@ -0,0 +1,255 @@
+import functools
+import math
+import os
+from collections import Counter
+
+import numpy as np
+from config import (SIGNS, LEXICON_PATH, WORD_BEAM_WIDTH, WORD_TOP_K, LM_WEIGHT, OOV_PENALTY, NUM_SUGGESTIONS)
+
+SPACE_SIGN = 'SPACE'  # the sign that ends a word
+START, END = '^', '$'  # padding before a word and the end-of-word symbol of the character model
+CHAR_ORDER = 3         # character n-gram order: letters are predicted from the two before them
+MIN_PROBABILITY = 1e-4  # floor for classifier probabilities, so one bad frame cannot veto a word
+
+
+class TrieNode:
+    __slots__ = ('children', 'count', 'total', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.count = 0  # occurrences of the word ending here
+        self.total = 0  # occurrences of all words below this node
+        self.top = []   # most frequent (count, word) pairs below this node
+
+
+class Lexicon:
+    """
+    Word list compiled for decoding: a trie with word counts for prefix and word
+    probabilities, the most frequent completions stored at every node, and a
+    Witten-Bell smoothed character n-gram model for spelling words that are not
+    in the list. Built once and shared (read-only) by any number of WordDecoders.
+    """
+    def __init__(self, words, num_suggestions=NUM_SUGGESTIONS):
+        self.root = TrieNode()
+        self.symbols = sorted(name for name in SIGNS.values() if len(name) == 1) + [END]
+        self.symbol_index = {c: i for i, c in enumerate(self.symbols)}
+        for word, count in words.items():
+            node = self.root
+            node.total += count
+            for c in word:
+                node = node.children.setdefault(c, TrieNode())
+                node.total += count
+            node.count += count
+        self._collect_top(self.root, '', num_suggestions)
+        self.char_model = self._train_char_model(words)
+
+    def _collect_top(self, node, prefix, n):
+        # Iterative post-order walk, children before their parent
+        stack = [(node, prefix, False)]
+        while stack:
+            node, prefix, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, prefix, True))
+                stack.extend((child, prefix + c, False) for c, child in node.children.items())
+                continue
+            candidates = [(node.count, prefix)] if node.count else []
+            for child in node.children.values():
+                candidates.extend(child.top)
+            node.top = sorted(candidates, key=lambda item: (-item[0], item[1]))[:n]
+
+    def _train_char_model(self, words):
+        """
+        {context: log-probabilities over self.symbols} for every context seen
+        in the word list, from the empty context up to CHAR_ORDER - 1 letters.
+        Each word type counts once, so frequent words do not crowd out spelling.
+        """
+        ngrams = Counter()
+        for word in words:
+            padded = START * (CHAR_ORDER - 1) + word + END
+            for i in range(CHAR_ORDER - 1, len(padded)):
+                for length in range(CHAR_ORDER):
+                    ngrams[padded[i - length:i + 1]] += 1
+        counts = {}
+        for ngram, count in ngrams.items():
+            row = counts.setdefault(ngram[:-1], np.zeros(len(self.symbols)))
+            row[self.symbol_index[ngram[-1]]] = count
+
+        model = {}
+        uniform = np.full(len(self.symbols), 1.0 / len(self.symbols))
+        for context in sorted(counts, key=len):  # shorter contexts first: they are the back-off
+            row = counts[context]
+            lower = model.get(context[1:], uniform) if context else uniform
+            seen, types = row.sum(), np.count_nonzero(row)
+            model[context] = (row + types * lower) / (seen + types)
+        return {context: np.log(probabilities) for context, probabilities in model.items()}
+
+    def char_log_prob(self, letters, symbol):
+        """log P(symbol | the letters before it) under the character model."""
+        index = self.symbol_index[symbol]
+        history = (START * (CHAR_ORDER - 1) + letters)[-(CHAR_ORDER - 1):]
+        for start in range(len(history) + 1):
+            row = self.char_model.get(history[start:])
+            if row is not None:
+                return float(row[index])
+        return math.log(1.0 / len(self.symbols))
+
+    @classmethod
+    def from_file(cls, path, num_suggestions=NUM_SUGGESTIONS):
+        """
+        Reads one word per line, optionally followed by its count
+        ("HELLO 120"). Words are upper-cased; words with characters that are
+        not signs are skipped.
+        """
+        letters = {name for name in SIGNS.values() if len(name) == 1}
+        words = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                word = parts[0].upper()
+                if not set(word) <= letters:  # self.symbols only covers the signed letters
+                    continue
+                count = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+                words[word] = words.get(word, 0) + max(count, 1)
+        return cls(words, num_suggestions)
+
+
+@functools.lru_cache(maxsize=4)
+def _load_lexicon(path, mtime, num_suggestions):
+    return Lexicon.from_file(path, num_suggestions)
+
+
+def load_lexicon(path=LEXICON_PATH, num_suggestions=NUM_SUGGESTIONS):
+    """The Lexicon for a word list (cached until the file changes), or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    return _load_lexicon(path, os.path.getmtime(path), num_suggestions)
+
+
+class WordDecoder:
+    """
+    Corrects the letters of the word being signed against a Lexicon.
+
+    add() takes each committed letter with the classifier's probabilities at
+    the time of the commit and extends a beam of spelling hypotheses with the
+    top_k most likely letters. Hypotheses inside the lexicon are scored with
+    the trie's prefix probabilities; leaving it costs oov_penalty and continues
+    with the character model, so names and rare words can still be spelled.
+    Language model scores are weighted by lm_weight against the classifier's
+    log-probabilities. hypothesis() and suggestions() are updated after every
+    letter; finish() returns the best complete word.
+    """
+    def __init__(self, lexicon, beam_width=WORD_BEAM_WIDTH, top_k=WORD_TOP_K, lm_weight=LM_WEIGHT,
+                 oov_penalty=OOV_PENALTY, num_suggestions=NUM_SUGGESTIONS):
+        self.lexicon = lexicon
+        self.beam_width = beam_width
+        self.top_k = top_k
+        self.lm_weight = lm_weight
+        self.oov_penalty = oov_penalty
+        self.num_suggestions = num_suggestions
+        self.letter_ids = np.array([class_id for class_id, name in SIGNS.items() if len(name) == 1])
+        self.letter_names = [SIGNS[class_id] for class_id in self.letter_ids]
+        self.letter_set = set(self.letter_ids.tolist())
+        self.reset()
+
+    def reset(self):
+        # Beam entries: (total score, classifier score, language model score, letters, trie node or None)
+        self.beams = [(0.0, 0.0, 0.0, '', self.lexicon.root)]
+        self.history = []  # beams before each letter, for backspace()
+        self.letters = []  # the letters as committed, uncorrected
+        self._suggestions = []
+
+    def is_letter(self, class_id):
+        """Whether class_id is one of the letter signs this decoder spells with."""
+        return class_id in self.letter_set
+
+    def _letter_candidates(self, class_id, probabilities):
+        """(letter, log-probability) for the top_k letters, always including class_id's."""
+        name = SIGNS[class_id]
+        if probabilities is None or int(np.argmax(probabilities)) != class_id:
+            return [(name, 0.0)]  # the temporal decoder disagrees with these probabilities; trust its letter
+        letter_probabilities = np.asarray(probabilities, dtype=np.float32)[self.letter_ids]
+        top = np.argpartition(letter_probabilities, -self.top_k)[-self.top_k:] \
+            if len(letter_probabilities) > self.top_k else np.arange(len(letter_probabilities))
+        return [(self.letter_names[i], math.log(max(float(letter_probabilities[i]), MIN_PROBABILITY)))
+                for i in top]
+
+    def add(self, class_id, probabilities=None):
+        """Add a committed letter. Returns the best hypothesis for the word so far."""
+        lexicon = self.lexicon
+        candidates = self._letter_candidates(class_id, probabilities)
+        extended = {}
+        for _, visual, language, letters, node in self.beams:
+            for letter, letter_log_prob in candidates:
+                child = node.children.get(letter) if node is not None else None
+                if child is not None:
+                    lm = math.log(child.total / node.total)
+                else:
+                    lm = lexicon.char_log_prob(letters, letter) - (self.oov_penalty if node is not None else 0.0)
+                new_visual, new_language = visual + letter_log_prob, language + lm
+                score = new_visual + self.lm_weight * new_language
+                spelled = letters + letter
+                if spelled not in extended or extended[spelled][0] < score:
+                    extended[spelled] = (score, new_visual, new_language, spelled, child)
+
+        self.history.append(self.beams)
+        self.letters.append(SIGNS[class_id])
+        self.beams = sorted(extended.values(), key=lambda beam: beam[0], reverse=True)[:self.beam_width]
+        self._suggestions = self._rank_suggestions()
+        return self.hypothesis()
+
+    def _end_score(self, beam):
+        """Score of a hypothesis once the word ends after its letters."""
+        score, visual, language, letters, node = beam
+        if node is not None and node.count:
+            return visual + self.lm_weight * (language + math.log(node.count / node.total))
+        penalty = self.oov_penalty if node is not None else 0.0
+        return visual + self.lm_weight * (language + self.lexicon.char_log_prob(letters, END) - penalty)
+
+    def _rank_suggestions(self):
+        best = {}
+        for score, _, _, _, node in self.beams:
+            if node is None:
+                continue
+            for count, word in node.top:
+                candidate = score + self.lm_weight * math.log(count / node.total)
+                if candidate > best.get(word, -math.inf):
+                    best[word] = candidate
+        return sorted(best, key=best.get, reverse=True)[:self.num_suggestions]
+
+    def hypothesis(self):
+        """The most likely spelling of the letters so far."""
+        return self.beams[0][3]
+
+    def suggestions(self):
+        """Most likely lexicon words starting with the current hypotheses."""
+        return list(self._suggestions)
+
+    def finish(self):
+        """End the word: returns the best complete word ('' if no letters) and starts a new one."""
+        word = max(self.beams, key=self._end_score)[3] if self.letters else ''
+        self.reset()
+        return word
+
+    def accept(self, index=0):
+        """End the word with one of the suggestions (the letters so far if there is none)."""
+        suggestions = self._suggestions
+        word = suggestions[index] if index < len(suggestions) else self.hypothesis()
+        self.reset()
+        return word
+
+    def backspace(self):
+        """Undo the last letter. Returns the removed letter, or None if the word is empty."""
+        if not self.history:
+            return None
+        self.beams = self.history.pop()
+        removed = self.letters.pop()
+        self._suggestions = self._rank_suggestions() if self.letters else []
+        return removed
+
+
+def create_word_decoder(path=LEXICON_PATH):
+    """A WordDecoder over the word list at path, or None if there is no word list."""
+    lexicon = load_lexicon(path)
+    return WordDecoder(lexicon) if lexicon is not None else None